@@ -1,33 +1,93 @@
-import os
-import sys
-import random
-from flask_migrate import migrate, upgrade
+import argparse
+from flask_migrate import upgrade
+from sqlalchemy import select
 from app import create_app, db
-from app.models.models import Sale
+from app.models.models import Sale, SalesDailyRollup
+from app.utils.backfill import Backfill, BACKFILL_CHUNK_SIZE
+from app.utils.cache import clear_cache
 
-def add_discount_migration():
+BACKFILL_NAME = 'sales.discount'
+
+def discount_expression():
+    """
+    Псевдослучайная скидка от 0% до 20% с двумя знаками после запятой,
+    вычисляемая в SQL из sale_id: повторный прогон пакета после сбоя
+    даёт те же значения
+    """
+    return (Sale.sale_id * 2654435761 % 2001) / 100.0
+
+def rollup_updater(where):
+    """
+    Обработчик before_chunk: скидки входят в дневные агрегаты, поэтому
+    в транзакции пакета из агрегатов вычитаются прежние значения его продаж
+    и добавляются новые. Затрагиваются только пары (день, продукт) продаж
+    пакета, сколько бы дней ни охватывал диапазон sale_id
+    """
+    def update_chunk_rollup(lower, upper):
+        criteria = [Sale.sale_id <= upper, *where]
+        if lower is not None:
+            criteria.append(Sale.sale_id > lower)
+        # Строки пакета блокируются до UPDATE, чтобы прочитанные значения не изменились
+        rows = db.session.execute(
+            select(Sale.product_id, Sale.date, Sale.quantity, Sale.discount, discount_expression())
+            .where(*criteria)
+            .with_for_update()
+        ).all()
+        SalesDailyRollup.apply_sales([(product_id, date, quantity, new) for product_id, date, quantity, _, new in rows])
+        SalesDailyRollup.apply_sales([(product_id, date, quantity, old) for product_id, date, quantity, old, _ in rows], sign=-1)
+    return update_chunk_rollup
+
+def print_progress(state):
+    done = f"{state['done'] * 100:.1f}%" if state['done'] is not None else '-'
+    rate = f"{state['rows_per_second']:,.0f} строк/с" if state['rows_per_second'] else '-'
+    eta = f", осталось ~{state['eta_seconds']:.0f} с" if state['eta_seconds'] is not None else ''
+    print(f"  {done}: ключ {state['last_key']}/{state['max_key']}, обновлено {state['rows_updated']} ({rate}{eta})")
+
+def add_discount_migration(args):
     app = create_app('default')
     with app.app_context():
-        # Создание миграции для добавления поля discount
-        print("Создание миграции для поля discount...")
-        migrate(message='add_discount_field')
-        
-        # Применение миграции
-        print("Применение миграции...")
+        # Поле discount создаётся базовой миграцией; применяем миграции проекта
+        print("Применение миграций...")
         upgrade()
-        
+
         # Обновление существующих записей случайными значениями скидок
         print("Обновление существующих записей случайными значениями скидок...")
-        
-        sales = Sale.query.all()
-        for sale in sales:
-            # Генерация случайной скидки от 0% до 20%
-            sale.discount = round(random.uniform(0, 20), 2)
-        
-        db.session.commit()
-        print(f"Обновлено {len(sales)} записей продаж со случайными скидками.")
-        
+
+        where = () if args.all else (Sale.discount.is_(None),)
+        backfill = Backfill(
+            BACKFILL_NAME,
+            Sale.__table__,
+            {Sale.discount: discount_expression()},
+            where=where,
+            chunk_size=args.chunk_size,
+            pause=args.pause,
+            max_rate=args.max_rate,
+            before_chunk=rollup_updater(where),
+            progress=print_progress
+        )
+        if args.restart:
+            backfill.reset()
+
+        checkpoint = backfill.checkpoint()
+        if checkpoint is not None and checkpoint.completed_at is not None:
+            print("Скидки уже обновлены ранее (--restart - обновить заново).")
+        else:
+            state = backfill.run()
+            print(f"Обновлено {state['rows_updated']} записей продаж со случайными скидками.")
+
+        # Закэшированная аналитика посчитана по старым скидкам
+        clear_cache()
+
         print("Миграция успешно выполнена!")
 
+def main():
+    parser = argparse.ArgumentParser(description='Добавление скидок к существующим продажам')
+    parser.add_argument('--chunk-size', type=int, default=BACKFILL_CHUNK_SIZE, help='Продаж в одной транзакции')
+    parser.add_argument('--pause', type=float, default=0, help='Пауза между пакетами в секундах')
+    parser.add_argument('--max-rate', type=float, default=None, help='Не больше стольких обновлённых строк в секунду')
+    parser.add_argument('--all', action='store_true', help='Перезаписать скидки всех продаж, а не только пустые')
+    parser.add_argument('--restart', action='store_true', help='Начать заново, отбросив сохранённый прогресс')
+    add_discount_migration(parser.parse_args())
+
 if __name__ == '__main__':
-    add_discount_migration() 
\ No newline at end of file
+    main()
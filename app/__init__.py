@@ -1,4 +1,4 @@
-from flask import Flask
+from flask import Flask, request
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from config import config
@@ -10,9 +10,33 @@ def create_app(config_name='default'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
     
+    # Кодировщик JSON для jsonify (orjson, если установлен)
+    from app.utils.json_provider import init_json_provider
+    init_json_provider(app)
+    
+    # Пул соединений с метриками ожидания
+    from app.utils.db_pool import init_db_pool
+    init_db_pool(app)
+    
     db.init_app(app)
     migrate.init_app(app, db)
     
+    # Метрики запросов, базы и кэша (/metrics)
+    from app.utils.metrics import init_metrics
+    init_metrics(app)
+    
+    # Бюджет SQL-запросов на HTTP-запрос и поиск N+1
+    from app.utils.query_budget import init_query_budget
+    init_query_budget(app)
+    
+    # Настройка кэша
+    from app.utils.cache import init_cache
+    init_cache(app)
+    
+    # Необязательный движок аналитики в памяти (NumPy)
+    from app.utils.columnar import init_columnar_engine
+    init_columnar_engine(app)
+    
     # Регистрация маршрутов
     from app.routes.category_routes import category_bp
     from app.routes.product_routes import product_bp
@@ -24,6 +48,16 @@ def create_app(config_name='default'):
     
     @app.route('/status')
     def status_check():
-        return {'status': 'OK'}, 200
+        if request.args.get('deep', '').lower() not in ('1', 'true'):
+            return {'status': 'OK'}, 200
+        
+        # Глубокая проверка: доступность базы и использование пула соединений
+        from app.utils.db_pool import ping_database, pool_status
+        database = ping_database(app.config['STATUS_PING_TTL'])
+        return {
+            'status': 'OK' if database['ok'] else 'ERROR',
+            'database': database,
+            'pool': pool_status()
+        }, 200 if database['ok'] else 503
         
     return app 
\ No newline at end of file
@@ -1,4 +1,6 @@
 from datetime import datetime
+from sqlalchemy import func, select, bindparam
+from sqlalchemy.dialects import postgresql, sqlite
 from app import db
 
 class Category(db.Model):
@@ -16,14 +18,27 @@ class Category(db.Model):
             'category_id': self.category_id,
             'name': self.name,
             'description': self.description,
-            'products_count': self.products.count()
+            'products_count': self.products_count
         }
+    
+    @classmethod
+    def list_columns(cls):
+        """
+        Колонки to_dict для чтения списков без ORM-объектов
+        """
+        return (cls.category_id, cls.name, cls.description, cls.products_count)
 
 
 class Product(db.Model):
     __tablename__ = 'products'
+    __table_args__ = (
+        # Список продуктов категории по ключу product_id и подсчёт products_count
+        db.Index('ix_products_category_id_product_id', 'category_id', 'product_id'),
+    )
     
     product_id = db.Column(db.Integer, primary_key=True)
+    # Артикул во внешнем каталоге - ключ синхронизации POST /products/bulk
+    sku = db.Column(db.String(64), unique=True, index=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     price = db.Column(db.Numeric(10, 2), nullable=False)
@@ -32,20 +47,67 @@ class Product(db.Model):
     
     # Отношение к продажам
     sales = db.relationship('Sale', backref='product', lazy='dynamic', cascade='all, delete-orphan')
+    daily_rollup = db.relationship('SalesDailyRollup', lazy='dynamic', cascade='all, delete-orphan')
     
     def to_dict(self):
         return {
             'product_id': self.product_id,
+            'sku': self.sku,
             'name': self.name,
             'description': self.description,
             'price': float(self.price),
             'stock': self.stock,
             'category_id': self.category_id
         }
+    
+    @classmethod
+    def list_columns(cls):
+        """
+        Колонки to_dict для чтения списков без ORM-объектов
+        """
+        return (cls.product_id, cls.sku, cls.name, cls.description, cls.price, cls.stock, cls.category_id)
+
+    @classmethod
+    def take_stock(cls, product_id, quantity):
+        """
+        Списывает quantity со склада одним условным UPDATE без предварительного
+        SELECT: параллельные списания не могут увести остаток в минус.
+        Возвращает False, если продукта нет или остатка не хватает.
+        Загруженные в сессию объекты Product не обновляются
+        """
+        return cls.query.filter(
+            cls.product_id == product_id,
+            cls.stock >= quantity
+        ).update({cls.stock: cls.stock - quantity}, synchronize_session=False) == 1
+
+    @classmethod
+    def return_stock(cls, product_id, quantity):
+        """
+        Возвращает quantity на склад атомарным UPDATE
+        """
+        return cls.query.filter(
+            cls.product_id == product_id
+        ).update({cls.stock: cls.stock + quantity}, synchronize_session=False) == 1
+
+
+# Количество продуктов загружается тем же запросом, что и категория,
+# вместо отдельного COUNT на каждую категорию
+Category.products_count = db.column_property(
+    select(func.count(Product.product_id))
+    .where(Product.category_id == Category.category_id)
+    .correlate_except(Product)
+    .scalar_subquery()
+)
 
 
 class Sale(db.Model):
     __tablename__ = 'sales'
+    __table_args__ = (
+        # Выборки за период: на PostgreSQL покрывающий, аналитика читает только индекс
+        db.Index('ix_sales_date_product_id', 'date', 'product_id', postgresql_include=['quantity', 'discount']),
+        # Продажи продукта (фильтр product_id, соединения, период продаж продукта)
+        db.Index('ix_sales_product_id_date', 'product_id', 'date'),
+    )
     
     sale_id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), nullable=False)
@@ -60,4 +122,120 @@ class Sale(db.Model):
             'quantity': self.quantity,
             'date': self.date,
             'discount': self.discount
-        } 
\ No newline at end of file
+        }
+    
+    @classmethod
+    def list_columns(cls):
+        """
+        Колонки to_dict для чтения списков без ORM-объектов
+        """
+        return (cls.sale_id, cls.product_id, cls.quantity, cls.date, cls.discount)
+    
+    @classmethod
+    def date_span(cls, *criteria):
+        """
+        Возвращает (минимальная дата, максимальная дата) продаж, удовлетворяющих условиям
+        """
+        return db.session.query(func.min(cls.date), func.max(cls.date)).filter(*criteria).one() 
+
+
+class SalesDailyRollup(db.Model):
+    """
+    Дневные агрегаты продаж по продукту. Выручка не хранится: она зависит
+    от текущей цены продукта и считается как price * discounted_quantity
+    """
+    __tablename__ = 'sales_daily_rollup'
+    __table_args__ = (
+        db.Index('ix_sales_daily_rollup_product_id', 'product_id'),
+    )
+    
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    # Сумма quantity * (1 - discount / 100) по продажам с заданной скидкой
+    discounted_quantity = db.Column(db.Float, nullable=False, default=0.0)
+    discount_sum = db.Column(db.Float, nullable=False, default=0.0)
+    discount_count = db.Column(db.Integer, nullable=False, default=0)
+    sale_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    @classmethod
+    def apply(cls, product_id, date, quantity, discount, sign=1):
+        """
+        Добавляет (sign=1) или вычитает (sign=-1) продажу из агрегата за её день.
+        Выполняется в текущей транзакции сессии
+        """
+        cls.apply_sales([(product_id, date, quantity, discount)], sign)
+    
+    @classmethod
+    def apply_sales(cls, sales, sign=1):
+        """
+        Добавляет (sign=1) или вычитает (sign=-1) продажи (product_id, date, quantity, discount)
+        из агрегатов. Продажи одного дня и продукта складываются заранее, поэтому
+        на каждую пару (день, продукт) приходится одна строка пакетного upsert
+        """
+        deltas = {}
+        for product_id, date, quantity, discount in sales:
+            key = (date.date(), product_id)
+            delta = deltas.setdefault(key, {
+                'day': key[0],
+                'product_id': product_id,
+                'quantity': 0,
+                'discounted_quantity': 0.0,
+                'discount_sum': 0.0,
+                'discount_count': 0,
+                'sale_count': 0
+            })
+            delta['quantity'] += sign * quantity
+            if discount is not None:
+                delta['discounted_quantity'] += sign * quantity * (1 - discount / 100)
+                delta['discount_sum'] += sign * discount
+                delta['discount_count'] += sign
+            delta['sale_count'] += sign
+        if not deltas:
+            return
+        
+        table = cls.__table__
+        rows = list(deltas.values())
+        names = ('quantity', 'discounted_quantity', 'discount_sum', 'discount_count', 'sale_count')
+        
+        dialect = db.engine.dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+            stmt = insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.day, table.c.product_id],
+                set_={name: table.c[name] + stmt.excluded[name] for name in names}
+            )
+            db.session.execute(stmt, rows)
+        else:
+            for row in rows:
+                updated = db.session.execute(
+                    table.update()
+                    .where(table.c.day == row['day'], table.c.product_id == row['product_id'])
+                    .values({name: table.c[name] + row[name] for name in names})
+                ).rowcount
+                if not updated:
+                    db.session.execute(table.insert().values(**row))
+        
+        if sign < 0:
+            db.session.execute(
+                table.delete()
+                .where(table.c.day == bindparam('day'), table.c.product_id == bindparam('product_id'), table.c.sale_count <= 0),
+                [{'day': day, 'product_id': product_id} for day, product_id in deltas]
+            )
+
+
+class BackfillCheckpoint(db.Model):
+    """
+    Прогресс пакетного обновления данных (app/utils/backfill.py): последний
+    обработанный ключ фиксируется в той же транзакции, что и сам пакет
+    """
+    __tablename__ = 'backfill_checkpoints'
+    
+    name = db.Column(db.String(100), primary_key=True)
+    last_key = db.Column(db.BigInteger)
+    rows_updated = db.Column(db.BigInteger, nullable=False, default=0)
+    chunks = db.Column(db.Integer, nullable=False, default=0)
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)
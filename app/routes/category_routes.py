@@ -1,18 +1,33 @@
 from flask import Blueprint, request, jsonify
 from app import db
-from app.models.models import Category
+from app.models.models import Category, Product, Sale, SalesDailyRollup
+from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
+from app.utils.cache import invalidate_date_range
+from app.utils import columnar
+from app.utils.pagination import keyset_paginate, PaginationError
+from app.utils.rows import rows_to_dicts, select_fields, with_columns, FieldsError
 
 category_bp = Blueprint('categories', __name__)
 
 @category_bp.route('/categories', methods=['GET'])
 def get_categories():
     try:
-        categories = Category.query.all()
+        # Только чтение: запрошенные колонки to_dict без ORM-объектов;
+        # подзапрос products_count выполняется, только если поле запрошено
+        columns = select_fields(request.args, Category.list_columns())
+        query = select(*with_columns(columns, (Category.category_id,)))
+        categories, pagination = keyset_paginate(query, (Category.category_id,), request.args)
         return jsonify({
             'success': True,
-            'data': [category.to_dict() for category in categories]
+            'data': rows_to_dicts(categories, columns),
+            'pagination': pagination
         }), 200
+    except (PaginationError, FieldsError) as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -22,7 +37,8 @@ def get_categories():
 @category_bp.route('/categories/<int:category_id>', methods=['GET'])
 def get_category(category_id):
     try:
-        category = Category.query.get(category_id)
+        columns = select_fields(request.args, Category.list_columns())
+        category = db.session.execute(select(*columns).where(Category.category_id == category_id)).first()
         if not category:
             return jsonify({
                 'success': False,
@@ -31,8 +47,13 @@ def get_category(category_id):
         
         return jsonify({
             'success': True,
-            'data': category.to_dict()
+            'data': rows_to_dicts([category], columns)[0]
         }), 200
+    except FieldsError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -121,9 +142,24 @@ def delete_category(category_id):
                 'message': f'Category with id {category_id} not found'
             }), 404
         
+        # Продукты и их продажи удаляются вместе с категорией - запоминаем период продаж
+        sales_span = Sale.date_span(Sale.product.has(category_id=category_id))
+        product_ids = [product_id for product_id, in db.session.query(Product.product_id).filter_by(category_id=category_id)]
+        
+        # Каскад ORM загружал бы продажи и агрегаты каждого продукта отдельным запросом (N+1),
+        # поэтому зависимые строки удаляются несколькими запросами на всю категорию
+        if product_ids:
+            for chunk_start in range(0, len(product_ids), 1000):
+                chunk = product_ids[chunk_start:chunk_start + 1000]
+                SalesDailyRollup.query.filter(SalesDailyRollup.product_id.in_(chunk)).delete(synchronize_session=False)
+                Sale.query.filter(Sale.product_id.in_(chunk)).delete(synchronize_session=False)
+            Product.query.filter_by(category_id=category_id).delete(synchronize_session=False)
         db.session.delete(category)
         db.session.commit()
         
+        invalidate_date_range(*sales_span)
+        columnar.forget_products(*product_ids)
+        
         return jsonify({
             'success': True,
             'message': 'Category deleted successfully'
@@ -1,24 +1,184 @@
+from decimal import Decimal, InvalidOperation
 from flask import Blueprint, request, jsonify
+from sqlalchemy import bindparam, literal_column, select
+from sqlalchemy.dialects import postgresql, sqlite
 from app import db
-from app.models.models import Product, Category
+from app.models.models import Product, Category, Sale
 from sqlalchemy.exc import SQLAlchemyError
+from app.utils.cache import invalidate_date_range
+from app.utils import columnar
+from app.utils.pagination import keyset_paginate, PaginationError
+from app.utils.rows import rows_to_dicts, select_fields, with_columns, FieldsError
 
 product_bp = Blueprint('products', __name__)
 
+# Максимальное количество продуктов в одном запросе синхронизации
+MAX_BULK_PRODUCTS = 10000
+# Сколько ключей или строк передаётся в один запрос к базе
+BULK_CHUNK_SIZE = 1000
+# Колонки продукта, которые записывает синхронизация
+BULK_PRODUCT_COLUMNS = ('sku', 'name', 'description', 'price', 'stock', 'category_id')
+PRICE_PRECISION = Decimal('0.01')
+
+def _chunks(items, size=BULK_CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _parse_bulk_product(item):
+    """
+    Проверяет элемент POST /products/bulk и возвращает словарь переданных полей.
+    При неверном значении - ValueError
+    """
+    if not isinstance(item, dict):
+        raise ValueError('Product must be an object')
+    if item.get('product_id') is None and not item.get('sku'):
+        raise ValueError('product_id or sku is required')
+    
+    values = {}
+    if item.get('product_id') is not None:
+        if not isinstance(item['product_id'], int) or isinstance(item['product_id'], bool):
+            raise ValueError('product_id must be an integer')
+        values['product_id'] = item['product_id']
+    if 'sku' in item:
+        if item['sku'] is not None and (not isinstance(item['sku'], str) or not 0 < len(item['sku']) <= 64):
+            raise ValueError('sku must be a non-empty string of at most 64 characters')
+        values['sku'] = item['sku']
+    if 'name' in item:
+        if not isinstance(item['name'], str) or not 0 < len(item['name']) <= 100:
+            raise ValueError('name must be a non-empty string of at most 100 characters')
+        values['name'] = item['name']
+    if 'description' in item:
+        if item['description'] is not None and not isinstance(item['description'], str):
+            raise ValueError('description must be a string')
+        values['description'] = item['description']
+    if 'price' in item:
+        try:
+            if isinstance(item['price'], bool):
+                raise InvalidOperation
+            price = Decimal(str(item['price'])).quantize(PRICE_PRECISION)
+        except (InvalidOperation, ValueError):
+            raise ValueError('price must be a number')
+        if price < 0:
+            raise ValueError('price must not be negative')
+        values['price'] = price
+    if 'stock' in item:
+        if not isinstance(item['stock'], int) or isinstance(item['stock'], bool) or item['stock'] < 0:
+            raise ValueError('stock must be a non-negative integer')
+        values['stock'] = item['stock']
+    if 'category_id' in item:
+        if not isinstance(item['category_id'], int) or isinstance(item['category_id'], bool):
+            raise ValueError('category_id must be an integer')
+        values['category_id'] = item['category_id']
+    return values
+
+def _load_bulk_products(product_ids, skus):
+    """
+    Загружает существующие продукты по product_id и sku (колонками, без ORM-объектов)
+    """
+    columns = (Product.product_id,) + tuple(getattr(Product, name) for name in BULK_PRODUCT_COLUMNS)
+    rows = {}
+    for column, keys in ((Product.product_id, product_ids), (Product.sku, skus)):
+        for chunk in _chunks(keys):
+            for row in db.session.query(*columns).filter(column.in_(chunk)):
+                row = row._asdict()
+                row['price'] = Decimal(row['price']).quantize(PRICE_PRECISION)
+                rows[row['product_id']] = row
+    return list(rows.values())
+
+def _write_bulk_products(inserts, updates):
+    """
+    Записывает изменённые продукты пакетным UPDATE, новые - пакетным
+    INSERT ... ON CONFLICT (sku) DO UPDATE (продукт с тем же артикулом мог
+    появиться параллельно). Возвращает ({sku: product_id} созданных продуктов,
+    {sku: product_id} продуктов, которые уже существовали и были обновлены)
+    """
+    table = Product.__table__
+    
+    if updates:
+        stmt = table.update().where(
+            table.c.product_id == bindparam('b_product_id')
+        ).values({name: bindparam(name) for name in BULK_PRODUCT_COLUMNS})
+        for chunk in _chunks(updates):
+            db.session.execute(stmt, [
+                dict({name: row[name] for name in BULK_PRODUCT_COLUMNS}, b_product_id=row['product_id'])
+                for row in chunk
+            ])
+    
+    created, existed = {}, {}
+    if not inserts:
+        return created, existed
+    
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        # xmax = 0 только у строк, вставленных этим запросом; у строк,
+        # обновлённых через ON CONFLICT, xmax - номер текущей транзакции
+        for chunk in _chunks(inserts):
+            stmt = postgresql.insert(table).values(chunk)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.sku],
+                set_={name: stmt.excluded[name] for name in BULK_PRODUCT_COLUMNS}
+            ).returning(table.c.sku, table.c.product_id, literal_column('(xmax = 0)'))
+            for sku, product_id, inserted in db.session.execute(stmt):
+                (created if inserted else existed)[sku] = product_id
+        return created, existed
+    
+    # Без RETURNING артикулы, появившиеся после проверки в маршруте,
+    # перепроверяются непосредственно перед вставкой
+    for chunk in _chunks(row['sku'] for row in inserts):
+        existed.update(db.session.query(Product.sku, Product.product_id).filter(Product.sku.in_(chunk)))
+    
+    if dialect == 'sqlite':
+        stmt = sqlite.insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.sku],
+            set_={name: stmt.excluded[name] for name in BULK_PRODUCT_COLUMNS}
+        )
+        rows = inserts
+    else:
+        stmt = table.insert()
+        rows = [row for row in inserts if row['sku'] not in existed]
+        if len(rows) < len(inserts):
+            db.session.execute(
+                table.update().where(table.c.sku == bindparam('b_sku')).values(
+                    {name: bindparam(name) for name in BULK_PRODUCT_COLUMNS if name != 'sku'}
+                ),
+                [
+                    dict({name: row[name] for name in BULK_PRODUCT_COLUMNS if name != 'sku'}, b_sku=row['sku'])
+                    for row in inserts if row['sku'] in existed
+                ]
+            )
+    for chunk in _chunks(rows):
+        db.session.execute(stmt, chunk)
+    
+    for chunk in _chunks(row['sku'] for row in inserts if row['sku'] not in existed):
+        created.update(db.session.query(Product.sku, Product.product_id).filter(Product.sku.in_(chunk)))
+    return created, existed
+
+
 @product_bp.route('/products', methods=['GET'])
 def get_products():
     try:
         category_id = request.args.get('category_id', type=int)
         
+        # Только чтение: запрошенные колонки to_dict без ORM-объектов
+        columns = select_fields(request.args, Product.list_columns())
+        query = select(*with_columns(columns, (Product.product_id,)))
         if category_id:
-            products = Product.query.filter_by(category_id=category_id).all()
-        else:
-            products = Product.query.all()
+            query = query.where(Product.category_id == category_id)
+        
+        products, pagination = keyset_paginate(query, (Product.product_id,), request.args)
             
         return jsonify({
             'success': True,
-            'data': [product.to_dict() for product in products]
+            'data': rows_to_dicts(products, columns),
+            'pagination': pagination
         }), 200
+    except (PaginationError, FieldsError) as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -28,7 +188,8 @@ def get_products():
 @product_bp.route('/products/<int:product_id>', methods=['GET'])
 def get_product(product_id):
     try:
-        product = Product.query.get(product_id)
+        columns = select_fields(request.args, Product.list_columns())
+        product = db.session.execute(select(*columns).where(Product.product_id == product_id)).first()
         if not product:
             return jsonify({
                 'success': False,
@@ -37,8 +198,13 @@ def get_product(product_id):
         
         return jsonify({
             'success': True,
-            'data': product.to_dict()
+            'data': rows_to_dicts([product], columns)[0]
         }), 200
+    except FieldsError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -67,6 +233,7 @@ def create_product():
             }), 404
         
         new_product = Product(
+            sku=data.get('sku'),
             name=data['name'],
             description=data.get('description', ''),
             price=data['price'],
@@ -77,6 +244,8 @@ def create_product():
         db.session.add(new_product)
         db.session.commit()
         
+        columnar.record_product(new_product)
+        
         return jsonify({
             'success': True,
             'message': 'Product created successfully',
@@ -94,6 +263,141 @@ def create_product():
             'message': str(e)
         }), 500
 
+@product_bp.route('/products/bulk', methods=['POST'])
+def bulk_upsert_products():
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('products'), list) or not data['products']:
+            return jsonify({
+                'success': False,
+                'message': 'A non-empty list of products is required'
+            }), 400
+        
+        items = data['products']
+        if len(items) > MAX_BULK_PRODUCTS:
+            return jsonify({
+                'success': False,
+                'message': f'Too many products in one request (max {MAX_BULK_PRODUCTS})'
+            }), 400
+        
+        results = [None] * len(items)
+        parsed = {}
+        for index, item in enumerate(items):
+            try:
+                parsed[index] = _parse_bulk_product(item)
+            except ValueError as e:
+                results[index] = {'index': index, 'status': 'failed', 'message': str(e)}
+        
+        # Категории и существующие продукты проверяются пакетными запросами, а не по одному
+        category_ids = {values['category_id'] for values in parsed.values() if 'category_id' in values}
+        known_categories = set()
+        for chunk in _chunks(category_ids):
+            known_categories.update(
+                category_id for category_id, in db.session.query(Category.category_id).filter(Category.category_id.in_(chunk))
+            )
+        
+        existing = _load_bulk_products(
+            {values['product_id'] for values in parsed.values() if 'product_id' in values},
+            {values['sku'] for values in parsed.values() if values.get('sku')}
+        )
+        by_id = {row['product_id']: row for row in existing}
+        by_sku = {row['sku']: row for row in existing if row['sku']}
+        
+        inserts, updates, price_changed = [], [], []
+        # Ключ строки (по product_id или по артикулу нового продукта) -> индекс элемента
+        claimed_rows, claimed_skus = {}, {}
+        for index, values in parsed.items():
+            current = by_id.get(values['product_id']) if 'product_id' in values else by_sku.get(values['sku'])
+            row_key = ('product_id', current['product_id']) if current else ('sku', values.get('sku'))
+            merged = dict(current or {'description': '', 'stock': 0})
+            merged.update(values)
+            owner = by_sku.get(merged.get('sku'))
+            
+            if 'product_id' in values and current is None:
+                message = f'Product with id {values["product_id"]} not found'
+            elif 'category_id' in values and values['category_id'] not in known_categories:
+                message = f'Category with id {values["category_id"]} not found'
+            elif current is None and any(name not in values for name in ('name', 'price', 'category_id')):
+                message = 'Fields name, price and category_id are required for new products'
+            elif row_key in claimed_rows:
+                message = f'Duplicate of item {claimed_rows[row_key]}'
+            elif merged.get('sku') in claimed_skus or (owner and owner['product_id'] != merged.get('product_id')):
+                message = f'SKU {merged["sku"]} is already used by another product'
+            else:
+                claimed_rows[row_key] = index
+                if merged.get('sku'):
+                    claimed_skus[merged['sku']] = index
+                
+                if current is None:
+                    inserts.append(merged)
+                    results[index] = {'index': index, 'status': 'created', 'sku': merged['sku']}
+                elif merged == current:
+                    # Неизменённые строки не записываются
+                    results[index] = {'index': index, 'status': 'unchanged', 'product_id': current['product_id']}
+                else:
+                    updates.append(merged)
+                    if merged['price'] != current['price']:
+                        price_changed.append(current['product_id'])
+                    results[index] = {'index': index, 'status': 'updated', 'product_id': current['product_id']}
+                continue
+            results[index] = {'index': index, 'status': 'failed', 'message': message}
+        
+        # Продажи продуктов с новой ценой - для сброса кэша аналитики
+        sales_span = Sale.date_span(Sale.product_id.in_(price_changed)) if price_changed else (None, None)
+        
+        created, existed = _write_bulk_products(inserts, updates)
+        db.session.commit()
+        
+        for result in results:
+            if result['status'] == 'created':
+                sku = result.pop('sku')
+                # Продукт с этим артикулом создан параллельно и был обновлён
+                if sku in existed:
+                    result['status'] = 'updated'
+                result['product_id'] = created.get(sku, existed.get(sku))
+        
+        # Цена влияет на выручку во всех периодах, где есть продажи продукта
+        if existed:
+            concurrent_span = Sale.date_span(Sale.product_id.in_(list(existed.values())))
+            if concurrent_span[0] is not None:
+                invalidate_date_range(*concurrent_span)
+        if sales_span[0] is not None:
+            invalidate_date_range(*sales_span)
+        written = dict(created, **existed)
+        columnar.record_products(
+            [(row['product_id'], row['name'], row['price']) for row in updates]
+            + [(written[row['sku']], row['name'], row['price']) for row in inserts if row['sku'] in written]
+        )
+        
+        counts = {status: 0 for status in ('created', 'updated', 'unchanged', 'failed')}
+        for result in results:
+            counts[result['status']] += 1
+        
+        if not counts['failed']:
+            message, status = 'Products synchronized successfully', 200
+        elif counts['failed'] < len(items):
+            message, status = 'Some products were not synchronized', 207
+        else:
+            message, status = 'No products were synchronized', 400
+        
+        return jsonify({
+            'success': not counts['failed'],
+            'message': message,
+            'data': dict(counts, results=results)
+        }), status
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
 @product_bp.route('/products/<int:product_id>', methods=['PUT'])
 def update_product(product_id):
     try:
@@ -116,10 +420,13 @@ def update_product(product_id):
                 }), 404
             product.category_id = data['category_id']
         
+        if 'sku' in data:
+            product.sku = data['sku']
         if 'name' in data:
             product.name = data['name']
         if 'description' in data:
             product.description = data['description']
+        price_changed = 'price' in data and float(data['price']) != float(product.price)
         if 'price' in data:
             product.price = data['price']
         if 'stock' in data:
@@ -127,6 +434,11 @@ def update_product(product_id):
         
         db.session.commit()
         
+        # Цена влияет на выручку во всех периодах, где есть продажи продукта
+        if price_changed:
+            invalidate_date_range(*Sale.date_span(Sale.product_id == product_id))
+        columnar.record_product(product)
+        
         return jsonify({
             'success': True,
             'message': 'Product updated successfully',
@@ -154,9 +466,15 @@ def delete_product(product_id):
                 'message': f'Product with id {product_id} not found'
             }), 404
         
+        # Продажи удаляются вместе с продуктом - запоминаем их период
+        sales_span = Sale.date_span(Sale.product_id == product_id)
+        
         db.session.delete(product)
         db.session.commit()
         
+        invalidate_date_range(*sales_span)
+        columnar.forget_products(product_id)
+        
         return jsonify({
             'success': True,
             'message': 'Product deleted successfully'
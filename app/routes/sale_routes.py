@@ -1,21 +1,256 @@
-from flask import Blueprint, request, jsonify
+import io
+import csv
+import json
+import zlib
+import itertools
+from collections import defaultdict
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
 from app import db
-from app.models.models import Sale, Product
+from app.models.models import Sale, Product, SalesDailyRollup
+from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import func, desc
-from datetime import datetime as dt
-from app.utils.cache import cached, clear_cache
+from datetime import datetime as dt, timezone
+from app.utils.cache import cached, clear_cache, get_cache_stats, invalidate_date_range
+from app.utils.pagination import keyset_paginate
+from app.utils.rows import rows_to_dicts, select_fields, with_columns, FieldsError
+from app.utils import rollup as sales_rollup
+from app.utils import columnar
 
 sale_bp = Blueprint('sales', __name__)
 
+# Сколько секунд после истечения TTL аналитика отдаётся из кэша, пока обновляется в фоне
+ANALYTICS_STALE_TTL = 15 * 60
+
+def analytics_ttl():
+    # Ответ движка в памяти может не учитывать записи других воркеров до его перезагрузки,
+    # поэтому в кэше (в том числе общем для воркеров) он живёт не дольше периода перезагрузки
+    max_age = columnar.result_max_age()
+    return None if max_age is None else min(max_age, current_app.config['CACHE_TTL'])
+
+def analytics_stale_ttl():
+    return ANALYTICS_STALE_TTL if columnar.result_max_age() is None else 0
+
+# Максимальное количество интервалов во временном ряду
+MAX_TIMESERIES_BUCKETS = 5000
+
+# Допустимые ключи сортировки списка продаж (sale_id замыкает ключ для уникальности)
+SALE_SORT_KEYS = {
+    'sale_id': (Sale.sale_id,),
+    'date': (Sale.date, Sale.sale_id)
+}
+
+def sales_filters(args):
+    """
+    Строит условия выборки продаж по параметрам product_id, start_date,
+    end_date и min_quantity. При неверном значении - ValueError
+    """
+    filters = []
+    
+    if 'product_id' in args:
+        try:
+            filters.append(Sale.product_id == int(args['product_id']))
+        except ValueError:
+            raise ValueError('product_id must be an integer')
+    
+    try:
+        if 'start_date' in args:
+            filters.append(Sale.date >= dt.fromisoformat(args['start_date']))
+        if 'end_date' in args:
+            filters.append(Sale.date <= dt.fromisoformat(args['end_date']))
+    except ValueError:
+        raise ValueError('Invalid date format. Use ISO format (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS)')
+    
+    if 'min_quantity' in args:
+        try:
+            filters.append(Sale.quantity >= int(args['min_quantity']))
+        except ValueError:
+            raise ValueError('min_quantity must be an integer')
+    
+    return filters
+
+# Сколько строк выгрузки читается из курсора и отправляется клиенту за раз
+EXPORT_CHUNK_SIZE = 5000
+EXPORT_COLUMNS = ('sale_id', 'product_id', 'quantity', 'date', 'discount')
+EXPORT_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+def _export_chunks(rows, export_format):
+    # Превращает поток строк в куски NDJSON или CSV по EXPORT_CHUNK_SIZE строк
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if export_format == 'csv' else None
+    if writer:
+        writer.writerow(EXPORT_COLUMNS)
+    
+    count = 0
+    for sale_id, product_id, quantity, date, discount in rows:
+        if writer:
+            writer.writerow((sale_id, product_id, quantity, date.isoformat(), discount))
+        else:
+            buffer.write(json.dumps({
+                'sale_id': sale_id,
+                'product_id': product_id,
+                'quantity': quantity,
+                'date': date.isoformat(),
+                'discount': discount
+            }))
+            buffer.write('\n')
+        count += 1
+        if count % EXPORT_CHUNK_SIZE == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+# Максимальное количество продаж в одном пакете
+MAX_BATCH_SIZE = 1000
+# atomic - пакет записывается целиком или не записывается вовсе,
+# best_effort - записываются все элементы, прошедшие проверку
+BATCH_MODES = ('atomic', 'best_effort')
+
+def _parse_batch_item(item, now):
+    """
+    Проверяет элемент пакета продаж и возвращает (product_id, quantity, date, discount).
+    При неверном значении - ValueError
+    """
+    if not isinstance(item, dict) or 'product_id' not in item or 'quantity' not in item:
+        raise ValueError('Product ID and quantity are required')
+    
+    product_id, quantity = item['product_id'], item['quantity']
+    if not isinstance(product_id, int) or isinstance(product_id, bool):
+        raise ValueError('product_id must be an integer')
+    if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity <= 0:
+        raise ValueError('quantity must be a positive integer')
+    
+    discount = item.get('discount', 0.0)
+    if not isinstance(discount, (int, float)) or isinstance(discount, bool) or not 0 <= discount <= 100:
+        raise ValueError('discount must be a number between 0 and 100')
+    
+    try:
+        date = dt.fromisoformat(item['date']) if 'date' in item else now
+    except (TypeError, ValueError):
+        raise ValueError('Invalid date format. Use ISO format (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS)')
+    # Даты продаж хранятся без часового пояса (UTC); в пакете могут смешиваться
+    # даты с часовым поясом и без, и их нужно сравнивать между собой
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    
+    return product_id, quantity, date, float(discount)
+
+def _insert_sales(rows):
+    """
+    Вставляет продажи пакетом и возвращает их sale_id в порядке rows
+    """
+    table = Sale.__table__
+    if db.engine.dialect.full_returning:
+        # Один INSERT ... VALUES (...), (...) RETURNING sale_id
+        return list(db.session.execute(table.insert().values(rows).returning(table.c.sale_id)).scalars())
+    if db.engine.dialect.name == 'sqlite':
+        # SQLite без RETURNING: одна пакетная вставка, затем последние len(rows) ключей.
+        # Транзакция уже держит блокировку записи (остатки обновлены), поэтому
+        # других вставок между ними нет, а rowid выдаются по возрастанию
+        db.session.execute(table.insert(), rows)
+        sale_ids = db.session.query(Sale.sale_id).order_by(Sale.sale_id.desc()).limit(len(rows))
+        return [sale_id for sale_id, in sale_ids][::-1]
+    # Остальные базы: ключи берутся из курсора после каждой строки
+    db.session.bulk_insert_mappings(Sale, rows, return_defaults=True)
+    return [row['sale_id'] for row in rows]
+
+def _stock_error(product_id, message='Not enough stock available'):
+    """
+    Ответ на неудавшееся списание: 404, если продукта нет, иначе 400
+    """
+    if db.session.query(Product.product_id).filter(Product.product_id == product_id).first() is None:
+        return jsonify({
+            'success': False,
+            'message': f'Product with id {product_id} not found'
+        }), 404
+    return jsonify({
+        'success': False,
+        'message': message
+    }), 400
+
 @sale_bp.route('/sales', methods=['GET'])
 def get_sales():
     try:
-        sales = Sale.query.all()
+        sort = request.args.get('sort', 'sale_id')
+        descending = sort.startswith('-')
+        sort_key = SALE_SORT_KEYS.get(sort.lstrip('-'))
+        if sort_key is None:
+            return jsonify({
+                'success': False,
+                'message': f'Invalid sort. Allowed values: {", ".join(SALE_SORT_KEYS)} (prefix "-" for descending order)'
+            }), 400
+        
+        # Только чтение: запрошенные колонки to_dict без ORM-объектов
+        columns = select_fields(request.args, Sale.list_columns())
+        query = select(*with_columns(columns, sort_key)).where(*sales_filters(request.args))
+        sales, pagination = keyset_paginate(query, sort_key, request.args, descending)
+        
         return jsonify({
             'success': True,
-            'data': [sale.to_dict() for sale in sales]
+            'data': rows_to_dicts(sales, columns),
+            'pagination': pagination
         }), 200
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
+@sale_bp.route('/sales/export', methods=['GET'])
+def export_sales():
+    try:
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in EXPORT_MIMETYPES:
+            return jsonify({
+                'success': False,
+                'message': 'Invalid format. Allowed values: ndjson, csv'
+            }), 400
+        
+        # Читаем только нужные колонки серверным курсором, без ORM-объектов
+        rows = db.session.query(
+            Sale.sale_id, Sale.product_id, Sale.quantity, Sale.date, Sale.discount
+        ).filter(
+            *sales_filters(request.args)
+        ).order_by(
+            Sale.sale_id
+        ).yield_per(EXPORT_CHUNK_SIZE)
+        
+        chunks = _export_chunks(rows, export_format)
+        headers = {
+            'Content-Disposition': f'attachment; filename=sales.{export_format}'
+        }
+        if request.args.get('gzip', '').lower() in ('1', 'true'):
+            chunks = _gzip_chunks(chunks)
+            headers['Content-Encoding'] = 'gzip'
+        
+        return Response(
+            stream_with_context(chunks),
+            mimetype=EXPORT_MIMETYPES[export_format],
+            headers=headers
+        ), 200
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -25,7 +260,8 @@ def get_sales():
 @sale_bp.route('/sales/<int:sale_id>', methods=['GET'])
 def get_sale(sale_id):
     try:
-        sale = Sale.query.get(sale_id)
+        columns = select_fields(request.args, Sale.list_columns())
+        sale = db.session.execute(select(*columns).where(Sale.sale_id == sale_id)).first()
         if not sale:
             return jsonify({
                 'success': False,
@@ -34,8 +270,13 @@ def get_sale(sale_id):
         
         return jsonify({
             'success': True,
-            'data': sale.to_dict()
+            'data': rows_to_dicts([sale], columns)[0]
         }), 200
+    except FieldsError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -53,26 +294,19 @@ def create_sale():
                 'message': 'Product ID and quantity are required'
             }), 400
         
-        # Check if product exists
-        product = Product.query.get(data['product_id'])
-        if not product:
-            return jsonify({
-                'success': False,
-                'message': f'Product with id {data["product_id"]} not found'
-            }), 404
-        
-        # Check if enough stock available
-        if product.stock < data['quantity']:
+        if not isinstance(data['quantity'], int) or isinstance(data['quantity'], bool) or data['quantity'] <= 0:
             return jsonify({
                 'success': False,
-                'message': 'Not enough stock available'
+                'message': 'quantity must be a positive integer'
             }), 400
-            
-        # Update product stock
-        product.stock -= data['quantity']
         
         sale_date = dt.fromisoformat(data['date']) if 'date' in data else dt.utcnow()
         
+        # Остаток проверяется и списывается одним условным UPDATE
+        if not Product.take_stock(data['product_id'], data['quantity']):
+            db.session.rollback()
+            return _stock_error(data['product_id'])
+        
         new_sale = Sale(
             product_id=data['product_id'],
             quantity=data['quantity'],
@@ -80,8 +314,14 @@ def create_sale():
         )
         
         db.session.add(new_sale)
+        db.session.flush()
+        SalesDailyRollup.apply(new_sale.product_id, new_sale.date, new_sale.quantity, new_sale.discount)
         db.session.commit()
         
+        # Сбрасываем кэш аналитики за периоды, содержащие дату продажи
+        invalidate_date_range(new_sale.date)
+        columnar.record_sale(new_sale)
+        
         return jsonify({
             'success': True,
             'message': 'Sale recorded successfully',
@@ -99,6 +339,140 @@ def create_sale():
             'message': str(e)
         }), 500
 
+@sale_bp.route('/sales/batch', methods=['POST'])
+def create_sales_batch():
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('sales'), list) or not data['sales']:
+            return jsonify({
+                'success': False,
+                'message': 'A non-empty list of sales is required'
+            }), 400
+        
+        items = data['sales']
+        if len(items) > MAX_BATCH_SIZE:
+            return jsonify({
+                'success': False,
+                'message': f'Too many sales in one batch (max {MAX_BATCH_SIZE})'
+            }), 400
+        
+        mode = data.get('mode', 'atomic')
+        if mode not in BATCH_MODES:
+            return jsonify({
+                'success': False,
+                'message': f'Invalid mode. Allowed values: {", ".join(BATCH_MODES)}'
+            }), 400
+        
+        now = dt.utcnow()
+        results = [None] * len(items)
+        parsed = {}
+        for index, item in enumerate(items):
+            try:
+                parsed[index] = _parse_batch_item(item, now)
+            except ValueError as e:
+                results[index] = {'index': index, 'success': False, 'message': str(e)}
+        
+        # Все продукты пакета загружаются одним запросом. Строки блокируются до коммита
+        # (в порядке id, чтобы параллельные пакеты не взаимоблокировались)
+        product_ids = sorted({product_id for product_id, _, _, _ in parsed.values()})
+        products = {}
+        if product_ids:
+            products = {
+                product.product_id: product
+                for product in Product.query.filter(
+                    Product.product_id.in_(product_ids)
+                ).order_by(Product.product_id).with_for_update()
+            }
+        
+        # Остаток проверяется по суммарному количеству на продукт
+        requested = defaultdict(int)
+        for product_id, quantity, _, _ in parsed.values():
+            requested[product_id] += quantity
+        
+        stock = {product_id: product.stock or 0 for product_id, product in products.items()}
+        remaining = dict(stock)
+        accepted = []
+        for index, (product_id, quantity, _, _) in parsed.items():
+            if product_id not in products:
+                message = f'Product with id {product_id} not found'
+            elif mode == 'atomic' and requested[product_id] > stock[product_id]:
+                message = f'Not enough stock available (requested {requested[product_id]}, available {stock[product_id]})'
+            elif quantity > remaining[product_id]:
+                message = 'Not enough stock available'
+            else:
+                remaining[product_id] -= quantity
+                accepted.append(index)
+                continue
+            results[index] = {'index': index, 'success': False, 'message': message}
+        
+        failed = sum(1 for result in results if result is not None)
+        if mode == 'atomic' and failed:
+            for index in accepted:
+                results[index] = {'index': index, 'success': False, 'message': 'Not recorded: batch rejected'}
+            accepted = []
+        
+        rows = []
+        for index in accepted:
+            product_id, quantity, date, discount = parsed[index]
+            rows.append({'product_id': product_id, 'quantity': quantity, 'date': date, 'discount': discount})
+        
+        if rows:
+            for product_id, product in products.items():
+                if remaining[product_id] != stock[product_id]:
+                    product.stock = remaining[product_id]
+            
+            # Границы дат пакета считаются до коммита, чтобы ошибка не пришлась на уже сохранённые продажи
+            dates = [row['date'] for row in rows]
+            first_date, last_date = min(dates), max(dates)
+            
+            sale_ids = _insert_sales(rows)
+            SalesDailyRollup.apply_sales(
+                (row['product_id'], row['date'], row['quantity'], row['discount']) for row in rows
+            )
+            db.session.commit()
+            
+            # Сбрасываем кэш аналитики за периоды, пересекающиеся с датами пакета
+            invalidate_date_range(first_date, last_date)
+            columnar.record_sales([
+                (sale_id, row['date'], row['product_id'], row['quantity'], row['discount'])
+                for sale_id, row in zip(sale_ids, rows)
+            ])
+            
+            for index, sale_id, row in zip(accepted, sale_ids, rows):
+                results[index] = {'index': index, 'success': True, 'data': dict(row, sale_id=sale_id)}
+        else:
+            db.session.rollback()
+        
+        if not failed:
+            message, status = 'Sales recorded successfully', 201
+        elif rows:
+            message, status = 'Some sales were not recorded', 207
+        else:
+            message, status = 'No sales were recorded', 400
+        
+        return jsonify({
+            'success': not failed,
+            'message': message,
+            'data': {
+                'mode': mode,
+                'created': len(rows),
+                'failed': len(items) - len(rows),
+                'results': results
+            }
+        }), status
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
 @sale_bp.route('/sales/<int:sale_id>', methods=['PUT'])
 def update_sale(sale_id):
     try:
@@ -111,49 +485,57 @@ def update_sale(sale_id):
         
         data = request.get_json()
         old_quantity = sale.quantity
+        old_date = sale.date
+        old_product_id = sale.product_id
         
-        if 'product_id' in data and data['product_id'] != sale.product_id:
-            # Return the old product's stock
-            old_product = Product.query.get(sale.product_id)
-            if old_product:
-                old_product.stock += old_quantity
-                
-            # Check if new product exists and has enough stock
-            new_product = Product.query.get(data['product_id'])
-            if not new_product:
-                return jsonify({
-                    'success': False,
-                    'message': f'Product with id {data["product_id"]} not found'
-                }), 404
-                
-            quantity_to_deduct = data.get('quantity', old_quantity)
-            if new_product.stock < quantity_to_deduct:
-                return jsonify({
-                    'success': False,
-                    'message': 'Not enough stock available for new product'
-                }), 400
-                
-            new_product.stock -= quantity_to_deduct
-            sale.product_id = data['product_id']
-        
-        if 'quantity' in data:
-            product = Product.query.get(sale.product_id)
-            # Calculate stock adjustment
-            stock_adjustment = old_quantity - data['quantity']
-            if stock_adjustment < 0 and abs(stock_adjustment) > product.stock:
-                return jsonify({
-                    'success': False,
-                    'message': 'Not enough stock available'
-                }), 400
-                
-            product.stock += stock_adjustment
-            sale.quantity = data['quantity']
-            
-        if 'date' in data:
-            sale.date = dt.fromisoformat(data['date'])
+        new_product_id = data.get('product_id', old_product_id)
+        new_quantity = data.get('quantity', old_quantity)
+        if not isinstance(new_product_id, int) or isinstance(new_product_id, bool):
+            return jsonify({
+                'success': False,
+                'message': 'product_id must be an integer'
+            }), 400
+        if not isinstance(new_quantity, int) or isinstance(new_quantity, bool) or new_quantity <= 0:
+            return jsonify({
+                'success': False,
+                'message': 'quantity must be a positive integer'
+            }), 400
+        
+        new_date = dt.fromisoformat(data['date']) if 'date' in data else old_date
+        
+        # Остатки меняются условными UPDATE: списание проходит, только если остатка хватает
+        if new_product_id != old_product_id:
+            # Строки продуктов обновляются в порядке product_id,
+            # чтобы встречные переносы продаж не взаимоблокировались
+            if old_product_id < new_product_id:
+                Product.return_stock(old_product_id, old_quantity)
+            if not Product.take_stock(new_product_id, new_quantity):
+                db.session.rollback()
+                return _stock_error(new_product_id, 'Not enough stock available for new product')
+            if old_product_id > new_product_id:
+                Product.return_stock(old_product_id, old_quantity)
+        elif new_quantity > old_quantity:
+            if not Product.take_stock(old_product_id, new_quantity - old_quantity):
+                db.session.rollback()
+                return _stock_error(old_product_id)
+        elif new_quantity < old_quantity:
+            Product.return_stock(old_product_id, old_quantity - new_quantity)
+        
+        sale.product_id = new_product_id
+        sale.quantity = new_quantity
+        sale.date = new_date
+        
+        # Переносим продажу в дневных агрегатах
+        SalesDailyRollup.apply(old_product_id, old_date, old_quantity, sale.discount, sign=-1)
+        SalesDailyRollup.apply(sale.product_id, sale.date, sale.quantity, sale.discount)
         
         db.session.commit()
         
+        # Сбрасываем кэш аналитики за периоды, содержащие старую и новую дату продажи
+        invalidate_date_range(old_date)
+        invalidate_date_range(sale.date)
+        columnar.record_sale(sale)
+        
         return jsonify({
             'success': True,
             'message': 'Sale updated successfully',
@@ -182,13 +564,16 @@ def delete_sale(sale_id):
             }), 404
         
         # Return quantity to product stock
-        product = Product.query.get(sale.product_id)
-        if product:
-            product.stock += sale.quantity
-            
+        Product.return_stock(sale.product_id, sale.quantity)
+        
+        sale_date = sale.date
+        SalesDailyRollup.apply(sale.product_id, sale.date, sale.quantity, sale.discount, sign=-1)
         db.session.delete(sale)
         db.session.commit()
         
+        invalidate_date_range(sale_date)
+        columnar.forget_sales(sale_id)
+        
         return jsonify({
             'success': True,
             'message': 'Sale deleted successfully'
@@ -206,7 +591,7 @@ def delete_sale(sale_id):
         }), 500
 
 @sale_bp.route('/sales/total', methods=['GET'])
-@cached('total_sales')
+@cached('total_sales', ttl=analytics_ttl, coalesce=True, stale_ttl=analytics_stale_ttl)
 def get_total_sales():
     try:
         # Получаем параметры запроса
@@ -230,21 +615,13 @@ def get_total_sales():
                 'message': 'Неверный формат даты. Используйте ISO формат (YYYY-MM-DD или YYYY-MM-DDTHH:MM:SS)'
             }), 400
         
-        # Получаем все продажи за указанный период
+        # Получаем все продажи за указанный период: целые дни - из дневных агрегатов,
+        # неполные дни на краях периода - из таблицы продаж
         # Учитываем скидку при расчете общей суммы продаж
-        query = db.session.query(
-            func.sum(Sale.quantity * Product.price * (1 - Sale.discount/100)).label('total_amount_with_discount'),
-            func.avg(Sale.discount).label('avg_discount')
-        ).join(
-            Product, Sale.product_id == Product.product_id
-        ).filter(
-            Sale.date >= start_date,
-            Sale.date <= end_date
-        )
-        
-        result = query.first()
-        total_sales = float(result.total_amount_with_discount) if result.total_amount_with_discount else 0
-        avg_discount = round(float(result.avg_discount), 2) if result.avg_discount else 0
+        engine = columnar.get_columnar_engine() or sales_rollup
+        total_amount_with_discount, avg_discount = engine.total_sales(start_date, end_date)
+        total_sales = float(total_amount_with_discount) if total_amount_with_discount else 0
+        avg_discount = round(float(avg_discount), 2) if avg_discount else 0
         
         return jsonify({
             'success': True,
@@ -269,7 +646,7 @@ def get_total_sales():
         }), 500
 
 @sale_bp.route('/sales/top-products', methods=['GET'])
-@cached('top_products')
+@cached('top_products', ttl=analytics_ttl, coalesce=True, stale_ttl=analytics_stale_ttl)
 def get_top_products():
     try:
         # Получаем параметры запроса
@@ -306,26 +683,10 @@ def get_top_products():
             }), 400
         
         # Получаем топ продуктов по продажам за указанный период
+        # (целые дни - из дневных агрегатов, края периода - из таблицы продаж)
         # Учитываем скидку при расчете общей суммы продаж
-        query = db.session.query(
-            Product.product_id,
-            Product.name,
-            Product.price,
-            func.sum(Sale.quantity).label('total_quantity'),
-            func.avg(Sale.discount).label('avg_discount'),
-            func.sum(Sale.quantity * Product.price * (1 - Sale.discount/100)).label('total_amount_with_discount')
-        ).join(
-            Sale, Product.product_id == Sale.product_id
-        ).filter(
-            Sale.date >= start_date,
-            Sale.date <= end_date
-        ).group_by(
-            Product.product_id
-        ).order_by(
-            desc('total_quantity')
-        ).limit(limit)
-        
-        results = query.all()
+        engine = columnar.get_columnar_engine() or sales_rollup
+        results = engine.top_products(start_date, end_date, limit)
         
         top_products = [{
             'product_id': product.product_id,
@@ -358,6 +719,96 @@ def get_top_products():
             'message': str(e)
         }), 500
 
+@sale_bp.route('/sales/timeseries', methods=['GET'])
+@cached('sales_timeseries', coalesce=True, stale_ttl=ANALYTICS_STALE_TTL)
+def get_sales_timeseries():
+    try:
+        # Получаем параметры запроса
+        start_date_str = request.args.get('start_date')
+        end_date_str = request.args.get('end_date')
+        granularity = request.args.get('granularity', 'day')
+        
+        # Проверяем наличие обязательных параметров
+        if not start_date_str or not end_date_str:
+            return jsonify({
+                'success': False,
+                'message': 'Необходимо указать start_date и end_date'
+            }), 400
+        
+        if granularity not in sales_rollup.GRANULARITIES:
+            return jsonify({
+                'success': False,
+                'message': f'Неверное значение granularity. Допустимые значения: {", ".join(sales_rollup.GRANULARITIES)}'
+            }), 400
+        
+        # Проверяем и преобразуем фильтры
+        try:
+            product_id = int(request.args['product_id']) if 'product_id' in request.args else None
+            category_id = int(request.args['category_id']) if 'category_id' in request.args else None
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'message': 'product_id и category_id должны быть целыми числами'
+            }), 400
+        
+        # Преобразуем строки в объекты datetime
+        try:
+            start_date = dt.fromisoformat(start_date_str)
+            end_date = dt.fromisoformat(end_date_str)
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'message': 'Неверный формат даты. Используйте ISO формат (YYYY-MM-DD или YYYY-MM-DDTHH:MM:SS)'
+            }), 400
+        
+        buckets = list(itertools.islice(
+            sales_rollup.bucket_starts(start_date, end_date, granularity), MAX_TIMESERIES_BUCKETS + 1
+        ))
+        if len(buckets) > MAX_TIMESERIES_BUCKETS:
+            return jsonify({
+                'success': False,
+                'message': f'Слишком много интервалов (больше {MAX_TIMESERIES_BUCKETS}). Увеличьте granularity или сократите период'
+            }), 400
+        
+        # Все интервалы считаются одним сгруппированным запросом,
+        # интервалы без продаж заполняются нулями
+        # Учитываем скидку при расчете общей суммы продаж
+        rows = {
+            row[0]: row
+            for row in sales_rollup.sales_timeseries(start_date, end_date, granularity, product_id, category_id)
+        }
+        series = []
+        for bucket in buckets:
+            _, total_quantity, total_amount, discount_sum, discount_count = rows.get(bucket, (bucket, 0, 0, 0, 0))
+            series.append({
+                'bucket': bucket.isoformat(),
+                'total_quantity': total_quantity or 0,
+                'total_sales': round(float(total_amount), 2) if total_amount else 0,
+                'avg_discount': round(discount_sum / discount_count, 2) if discount_count else 0
+            })
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'period': {
+                    'start_date': start_date_str,
+                    'end_date': end_date_str
+                },
+                'granularity': granularity,
+                'series': series
+            }
+        }), 200
+    except SQLAlchemyError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
 @sale_bp.route('/sales/cache/clear', methods=['POST'])
 def clear_sales_cache():
     try:
@@ -370,4 +821,17 @@ def clear_sales_cache():
         return jsonify({
             'success': False,
             'message': str(e)
-        }), 500 
\ No newline at end of file
+        }), 500 
+
+@sale_bp.route('/sales/cache/stats', methods=['GET'])
+def get_sales_cache_stats():
+    try:
+        return jsonify({
+            'success': True,
+            'data': get_cache_stats()
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
\ No newline at end of file
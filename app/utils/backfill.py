@@ -0,0 +1,146 @@
+import time
+from datetime import datetime
+from sqlalchemy import func, select
+from app import db
+from app.models.models import BackfillCheckpoint
+
+# Строк первичного ключа в одном пакете
+BACKFILL_CHUNK_SIZE = 10000
+
+
+class Backfill:
+    """
+    Пакетное обновление таблицы по диапазонам первичного ключа.
+
+    Каждый пакет - один UPDATE ... WHERE key > :last AND key <= :upper
+    в отдельной короткой транзакции, вместе с которой в backfill_checkpoints
+    записывается последний обработанный ключ. После сбоя повторный запуск
+    с тем же name продолжает со следующего пакета. values - новые значения
+    колонок (SQL-выражения), where - дополнительные условия отбора строк,
+    before_chunk(lower, upper) и after_chunk(lower, upper) выполняются
+    в транзакции пакета до и после UPDATE.
+    pause задаёт паузу между пакетами в секундах, max_rate - предел
+    обновляемых строк в секунду; progress(состояние) вызывается после
+    каждого пакета
+    """
+
+    def __init__(self, name, table, values, where=(), key=None, chunk_size=BACKFILL_CHUNK_SIZE,
+                 pause=0, max_rate=None, before_chunk=None, after_chunk=None, progress=None):
+        self.name = name
+        self.table = table
+        self.values = values
+        self.where = tuple(where)
+        self.key = key if key is not None else table.primary_key.columns.values()[0]
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.max_rate = max_rate
+        self.before_chunk = before_chunk
+        self.after_chunk = after_chunk
+        self.progress = progress
+
+    def checkpoint(self):
+        return BackfillCheckpoint.query.get(self.name)
+
+    def reset(self):
+        """
+        Удаляет сохранённый прогресс: следующий run начнёт с начала таблицы
+        """
+        BackfillCheckpoint.query.filter_by(name=self.name).delete()
+        db.session.commit()
+
+    def _next_upper(self, last_key, max_key):
+        # Ключ, которым заканчивается пакет из chunk_size строк после last_key
+        query = select(self.key).order_by(self.key).offset(self.chunk_size - 1).limit(1)
+        if last_key is not None:
+            query = query.where(self.key > last_key)
+        upper = db.session.execute(query).scalar()
+        return max_key if upper is None or upper > max_key else upper
+
+    def run(self):
+        """
+        Обрабатывает таблицу от сохранённого ключа до максимального ключа
+        на момент запуска (строки, добавленные позже, не обновляются).
+        Возвращает итоговое состояние прогресса
+        """
+        checkpoint = self.checkpoint()
+        if checkpoint is None:
+            checkpoint = BackfillCheckpoint(name=self.name, rows_updated=0, chunks=0)
+            db.session.add(checkpoint)
+            db.session.commit()
+        if checkpoint.completed_at is not None:
+            return self._state(checkpoint, None, None, None, 0, 0)
+
+        min_key, max_key = db.session.execute(select(func.min(self.key), func.max(self.key))).one()
+        table = self.table
+        checkpoints = BackfillCheckpoint.__table__
+        started = time.perf_counter()
+        rows_this_run = 0
+
+        last_key = start_key = checkpoint.last_key
+        while max_key is not None and (last_key is None or last_key < max_key):
+            upper = self._next_upper(last_key, max_key)
+            criteria = [self.key <= upper, *self.where]
+            if last_key is not None:
+                criteria.append(self.key > last_key)
+            try:
+                if self.before_chunk:
+                    self.before_chunk(last_key, upper)
+                rows = db.session.execute(table.update().where(*criteria).values(self.values)).rowcount
+                if self.after_chunk:
+                    self.after_chunk(last_key, upper)
+                db.session.execute(
+                    checkpoints.update()
+                    .where(checkpoints.c.name == self.name)
+                    .values(
+                        last_key=upper,
+                        rows_updated=checkpoints.c.rows_updated + rows,
+                        chunks=checkpoints.c.chunks + 1,
+                        updated_at=datetime.utcnow()
+                    )
+                )
+                db.session.commit()
+            except Exception:
+                # Незавершённый пакет откатывается целиком, прогресс остаётся на предыдущем
+                db.session.rollback()
+                raise
+            last_key = upper
+            rows_this_run += rows
+
+            if self.progress:
+                self.progress(self._state(checkpoint, min_key, max_key, start_key, rows_this_run, time.perf_counter() - started))
+
+            # Ограничение нагрузки на базу между короткими транзакциями
+            delay = self.pause
+            if self.max_rate:
+                delay = max(delay, rows_this_run / self.max_rate - (time.perf_counter() - started))
+            if delay > 0 and last_key < max_key:
+                time.sleep(delay)
+
+        checkpoint.completed_at = datetime.utcnow()
+        db.session.commit()
+        return self._state(checkpoint, min_key, max_key, start_key, rows_this_run, time.perf_counter() - started)
+
+    def _state(self, checkpoint, min_key, max_key, start_key, rows_this_run, elapsed):
+        last_key = checkpoint.last_key
+        done = eta = None
+        if checkpoint.completed_at is not None:
+            done = 1.0
+        elif max_key is not None and last_key is not None:
+            # Доля пройденного диапазона ключей; оценка остатка - по скорости текущего запуска
+            done = (last_key - min_key + 1) / (max_key - min_key + 1)
+            passed = last_key - (min_key - 1 if start_key is None else start_key)
+            if passed > 0 and elapsed:
+                eta = (max_key - last_key) * elapsed / passed
+        rate = rows_this_run / elapsed if elapsed else None
+        return {
+            'name': self.name,
+            'last_key': last_key,
+            'max_key': max_key,
+            'chunks': checkpoint.chunks,
+            'rows_updated': checkpoint.rows_updated,
+            'rows_this_run': rows_this_run,
+            'done': done,
+            'rows_per_second': rate,
+            'eta_seconds': eta,
+            'completed': checkpoint.completed_at is not None
+        }
@@ -1,11 +1,630 @@
+import os
+import sys
 import time
+import json
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from functools import wraps
-from flask import request, jsonify
+from flask import request, current_app
+from app.utils.metrics import record_cache_lookup, record_cache_evictions
 
-# Словарь для хранения кэша
-cache_store = {}
 # Время жизни кэша в секундах (5 минут)
 CACHE_TTL = 300
+# Максимальное количество записей в кэше
+CACHE_MAX_ENTRIES = 1024
+# Максимальный (приблизительный) объём кэша в байтах (64 МБ)
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Интервал между полными проходами по кэшу для удаления устаревших записей
+CACHE_SWEEP_INTERVAL = 60
+# Сколько секунд запрос ждёт результат, вычисляемый другим запросом с тем же ключом
+CACHE_SINGLE_FLIGHT_TIMEOUT = 10
+# Количество потоков для фонового обновления устаревших записей
+CACHE_REFRESH_WORKERS = 2
+
+
+def approx_size(value):
+    """
+    Приблизительно оценивает объём объекта в памяти (в байтах)
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approx_size(k) + approx_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(approx_size(item) for item in value)
+    return size
+
+
+class CacheBackend:
+    """
+    Базовый класс хранилища кэша. Бэкенд хранит значения с TTL
+    и необязательным периодом (start, end) для точечной инвалидации
+    """
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Создаёт бэкенд по параметрам конфигурации приложения
+        """
+        return cls(**cls.config_options(config))
+
+    @staticmethod
+    def config_options(config):
+        return {
+            'max_entries': config.get('CACHE_MAX_ENTRIES', CACHE_MAX_ENTRIES),
+            'max_bytes': config.get('CACHE_MAX_BYTES', CACHE_MAX_BYTES),
+            'default_ttl': config.get('CACHE_TTL', CACHE_TTL),
+            'sweep_interval': config.get('CACHE_SWEEP_INTERVAL', CACHE_SWEEP_INTERVAL)
+        }
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None, window=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def invalidate_window(self, start, end):
+        raise NotImplementedError
+
+    def sweep(self):
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+
+class LRUCache(CacheBackend):
+    """
+    Потокобезопасный LRU-кэш в памяти процесса с TTL для каждой записи,
+    ограничением по количеству записей и объёму, а также счётчиками статистики
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES,
+                 default_ttl=CACHE_TTL, sweep_interval=CACHE_SWEEP_INTERVAL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.sweep_interval = sweep_interval
+
+        # key -> (value, expires_at, size, window); порядок - от давно использованных к недавним
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._bytes = 0
+        self._last_sweep = time.monotonic()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def configure(self, max_entries=None, max_bytes=None, default_ttl=None, sweep_interval=None):
+        """
+        Изменяет параметры кэша и сразу применяет новые ограничения
+        """
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if default_ttl is not None:
+                self.default_ttl = default_ttl
+            if sweep_interval is not None:
+                self.sweep_interval = sweep_interval
+            self._enforce_limits()
+
+    def get(self, key):
+        """
+        Возвращает значение по ключу или None, если записи нет или она устарела
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at, _, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None, window=None):
+        """
+        Сохраняет значение с указанным TTL (по умолчанию - default_ttl).
+        window - необязательный период (start, end), на данных которого
+        построено значение; используется для точечной инвалидации
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        size = approx_size(key) + approx_size(value)
+
+        with self._lock:
+            self._maybe_sweep()
+
+            if key in self._entries:
+                self._remove(key)
+
+            # Запись, которая больше всего кэша, не сохраняем
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = (value, time.monotonic() + ttl, size, window)
+            self._bytes += size
+            self._enforce_limits()
+
+    def delete(self, key):
+        """
+        Удаляет запись по ключу
+        """
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        """
+        Удаляет все записи (статистика сохраняется)
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def invalidate_window(self, start, end):
+        """
+        Удаляет записи, период которых пересекается с [start, end],
+        и возвращает их количество
+        """
+        with self._lock:
+            affected = [
+                key for key, (_, _, _, window) in self._entries.items()
+                if window is not None and window[0] <= end and start <= window[1]
+            ]
+            for key in affected:
+                self._remove(key)
+            self.invalidations += len(affected)
+            return len(affected)
+
+    def sweep(self):
+        """
+        Удаляет все устаревшие записи и возвращает их количество
+        """
+        with self._lock:
+            now = time.monotonic()
+            expired = [key for key, (_, expires_at, _, _) in self._entries.items() if expires_at <= now]
+            for key in expired:
+                self._remove(key)
+            self.expirations += len(expired)
+            self._last_sweep = now
+            return len(expired)
+
+    def stats(self):
+        """
+        Возвращает текущие показатели кэша
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'memory',
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        _, _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _maybe_sweep(self):
+        # Амортизированная очистка: не чаще, чем раз в sweep_interval секунд
+        if time.monotonic() - self._last_sweep >= self.sweep_interval:
+            self.sweep()
+
+    def _enforce_limits(self):
+        # Вытесняем давно не использованные записи, пока не уложимся в лимиты
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+            record_cache_evictions([key])
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Общий для всех процессов узла кэш в файле SQLite.
+    Запись и чтение атомарны, очистка и инвалидация видны всем воркерам.
+    Вытесняются записи с самым давним обращением (приближённый LRU).
+
+    Хранит записи декоратора cached: тело ответа (bytes) - в колонке BLOB,
+    ETag - в TEXT, остальные поля - в JSON; из файла не десериализуются
+    произвольные объекты. Путь к файлу обязателен (CACHE_SQLITE_PATH),
+    файл создаётся с правами 0600
+    """
+
+    # Время последнего обращения обновляется не чаще раза в секунду,
+    # чтобы чтения не превращались в постоянные записи в файл
+    TOUCH_INTERVAL = 1.0
+
+    def __init__(self, path, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES,
+                 default_ttl=CACHE_TTL, sweep_interval=CACHE_SWEEP_INTERVAL):
+        if not path:
+            raise ValueError('SQLiteCache requires a file path (CACHE_SQLITE_PATH)')
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.sweep_interval = sweep_interval
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._last_sweep = time.time()
+
+        # Счётчики обращений ведутся в рамках процесса
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+        # Файл доступен только владельцу; WAL и shm SQLite создаёт с теми же правами
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        os.chmod(path, 0o600)
+
+        with self._connect() as conn:
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(cache_entries)')]
+            if 'value' in columns:
+                # Таблица прежнего формата с сериализованными pickle значениями
+                conn.execute('DROP TABLE cache_entries')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entries ('
+                ' key TEXT PRIMARY KEY,'
+                ' body BLOB NOT NULL,'
+                ' etag TEXT,'
+                ' meta TEXT NOT NULL,'
+                ' size INTEGER NOT NULL,'
+                ' expires_at REAL NOT NULL,'
+                ' accessed_at REAL NOT NULL,'
+                ' window_start TEXT,'
+                ' window_end TEXT)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_cache_entries_accessed_at ON cache_entries (accessed_at)')
+
+    @classmethod
+    def from_config(cls, config):
+        path = config.get('CACHE_SQLITE_PATH')
+        if not path:
+            raise ValueError('CACHE_BACKEND=sqlite requires CACHE_SQLITE_PATH')
+        return cls(path=path, **cls.config_options(config))
+
+    def get(self, key):
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT body, etag, meta, expires_at, accessed_at FROM cache_entries WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            self._count('misses')
+            return None
+
+        body, etag, meta, expires_at, accessed_at = row
+        if expires_at <= now:
+            with conn:
+                conn.execute('DELETE FROM cache_entries WHERE key = ? AND expires_at <= ?', (key, now))
+            self._count('expirations')
+            self._count('misses')
+            return None
+
+        if now - accessed_at >= self.TOUCH_INTERVAL:
+            with conn:
+                conn.execute('UPDATE cache_entries SET accessed_at = ? WHERE key = ?', (now, key))
+        self._count('hits')
+        value = json.loads(meta)
+        value['body'] = bytes(body)
+        if etag is not None:
+            value['etag'] = etag
+        return value
+
+    def set(self, key, value, ttl=None, window=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        if not isinstance(value, dict) or not isinstance(value.get('body'), bytes):
+            raise TypeError('SQLiteCache stores only entries with a bytes body')
+        body = value['body']
+        etag = value.get('etag')
+        meta = json.dumps({k: v for k, v in value.items() if k not in ('body', 'etag')})
+        size = len(body) + len(meta)
+        if size > self.max_bytes:
+            return
+
+        window_start, window_end = (w.isoformat() for w in window) if window else (None, None)
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache_entries '
+                '(key, body, etag, meta, size, expires_at, accessed_at, window_start, window_end) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, body, etag, meta, size, now + ttl, now, window_start, window_end)
+            )
+        self._maybe_sweep()
+        self._enforce_limits(conn)
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM cache_entries')
+
+    def invalidate_window(self, start, end):
+        with self._connect() as conn:
+            removed = conn.execute(
+                'DELETE FROM cache_entries WHERE window_start <= ? AND window_end >= ?',
+                (end.isoformat(), start.isoformat())
+            ).rowcount
+        self._count('invalidations', removed)
+        return removed
+
+    def sweep(self):
+        now = time.time()
+        with self._connect() as conn:
+            removed = conn.execute('DELETE FROM cache_entries WHERE expires_at <= ?', (now,)).rowcount
+        self._last_sweep = now
+        self._count('expirations', removed)
+        return removed
+
+    def stats(self):
+        entries, size = self._connect().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries'
+        ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'backend': 'sqlite',
+            'entries': entries,
+            'bytes': size,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations
+        }
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+
+    def _connect(self):
+        # Соединение - на поток; после fork воркера открываем новое
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.isolation_level = ''
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def _maybe_sweep(self):
+        if time.time() - self._last_sweep >= self.sweep_interval:
+            self.sweep()
+
+    def _enforce_limits(self, conn):
+        entries, size = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries'
+        ).fetchone()
+        if entries <= self.max_entries and size <= self.max_bytes:
+            return
+
+        # Удаляем записи с самым давним обращением, пока не уложимся в лимиты
+        excess_entries = max(entries - self.max_entries, 0)
+        excess_bytes = max(size - self.max_bytes, 0)
+        victims = []
+        for key, entry_size in conn.execute('SELECT key, size FROM cache_entries ORDER BY accessed_at'):
+            if excess_entries <= 0 and excess_bytes <= 0:
+                break
+            victims.append((key,))
+            excess_entries -= 1
+            excess_bytes -= entry_size
+        with conn:
+            conn.executemany('DELETE FROM cache_entries WHERE key = ?', victims)
+        self._count('evictions', len(victims))
+        record_cache_evictions(key for key, in victims)
+
+
+class SingleFlight:
+    """
+    Объединение одновременных вычислений (single-flight): для каждого ключа
+    результат вычисляет один запрос, остальные ждут и используют его.
+    Действует в пределах процесса (между потоками воркера)
+    """
+
+    class Flight:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def join(self, key):
+        """
+        Возвращает (flight, is_leader): лидер обязан вызвать finish(),
+        остальные ждут flight.done
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[key] = self.Flight()
+            self.leaders += 1
+            return flight, True
+
+    def wait(self, flight, timeout):
+        """
+        Ждёт результат лидера; возвращает None по таймауту или если лидер
+        не получил кэшируемого результата
+        """
+        if not flight.done.wait(timeout):
+            self._count('timeouts')
+            return None
+        if flight.result is not None:
+            self._count('coalesced')
+        return flight.result
+
+    def finish(self, key, flight, result):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.result = result
+        flight.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._flights),
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'timeouts': self.timeouts
+            }
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+
+class BackgroundRefresher:
+    """
+    Фоновое обновление устаревших записей (stale-while-revalidate):
+    пока запись обновляется в пуле потоков, клиентам отдаётся старое значение.
+    Для каждого ключа одновременно выполняется не более одного обновления
+    """
+
+    def __init__(self, max_workers=CACHE_REFRESH_WORKERS):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = set()
+        self.stale_hits = 0
+        self.scheduled = 0
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, key, func):
+        """
+        Ставит обновление ключа в очередь, если оно ещё не выполняется
+        """
+        with self._lock:
+            self.stale_hits += 1
+            if key in self._pending:
+                return False
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='cache-refresh'
+                )
+            self._pending.add(key)
+            self.scheduled += 1
+        self._executor.submit(self._run, key, func)
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                'stale_hits': self.stale_hits,
+                'pending': len(self._pending),
+                'scheduled': self.scheduled,
+                'completed': self.completed,
+                'failed': self.failed
+            }
+
+    def _run(self, key, func):
+        try:
+            func()
+            outcome = 'completed'
+        except Exception:
+            outcome = 'failed'
+        with self._lock:
+            self._pending.discard(key)
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+
+# Доступные бэкенды кэша (параметр конфигурации CACHE_BACKEND)
+CACHE_BACKENDS = {
+    'memory': LRUCache,
+    'sqlite': SQLiteCache
+}
+
+# Хранилище кэша (по умолчанию - в памяти процесса)
+cache_store = LRUCache()
+# Вычисления, выполняемые в данный момент декоратором cached
+single_flight = SingleFlight()
+# Фоновое обновление устаревших записей
+refresher = BackgroundRefresher()
+
+
+def init_cache(app):
+    """
+    Создаёт хранилище кэша по параметрам конфигурации приложения.
+    CACHE_BACKEND - имя из CACHE_BACKENDS или подкласс CacheBackend
+    """
+    global cache_store
+    refresher.max_workers = app.config.get('CACHE_REFRESH_WORKERS', CACHE_REFRESH_WORKERS)
+    backend = app.config.get('CACHE_BACKEND') or 'memory'
+    if isinstance(backend, str):
+        if backend not in CACHE_BACKENDS:
+            raise ValueError(f"Unknown cache backend: {backend}")
+        backend = CACHE_BACKENDS[backend]
+    cache_store = backend.from_config(app.config)
+
+def parse_date_window(params):
+    """
+    Возвращает период (start, end) из параметров start_date и end_date
+    или None, если они не заданы или имеют неверный формат
+    """
+    try:
+        start = _naive_utc(datetime.fromisoformat(params['start_date']))
+        end = _naive_utc(datetime.fromisoformat(params['end_date']))
+    except (KeyError, TypeError, ValueError):
+        return None
+    return start, end
+
+def _naive_utc(value):
+    # Даты продаж хранятся без часового пояса (UTC)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
 
 def generate_cache_key(prefix, **kwargs):
     """
@@ -15,32 +634,17 @@ def generate_cache_key(prefix, **kwargs):
     params_str = '&'.join(f"{k}={v}" for k, v in sorted_kwargs)
     return f"{prefix}:{params_str}"
 
-def set_cache(key, data):
+def set_cache(key, data, ttl=None, window=None):
     """
-    Сохраняет данные в кэш с текущим временем
+    Сохраняет данные в кэш на время ttl (по умолчанию - CACHE_TTL)
     """
-    cache_store[key] = {
-        'data': data,
-        'timestamp': time.time()
-    }
+    cache_store.set(key, data, ttl, window)
 
 def get_cache(key):
     """
     Получает данные из кэша, если они существуют и не устарели
     """
-    if key not in cache_store:
-        return None
-    
-    cache_entry = cache_store[key]
-    current_time = time.time()
-    
-    # Проверяем, не устарел ли кэш
-    if current_time - cache_entry['timestamp'] > CACHE_TTL:
-        # Удаляем устаревшую запись
-        del cache_store[key]
-        return None
-    
-    return cache_entry['data']
+    return cache_store.get(key)
 
 def clear_cache():
     """
@@ -48,34 +652,133 @@ def clear_cache():
     """
     cache_store.clear()
 
-def cached(prefix):
+def invalidate_date_range(start, end=None):
+    """
+    Удаляет из кэша результаты, построенные по периодам, которые
+    затрагивают дату start (или интервал [start, end])
+    """
+    if start is None:
+        return 0
+    start = _naive_utc(start)
+    end = start if end is None else _naive_utc(end)
+    return cache_store.invalidate_window(start, end)
+
+def get_cache_stats():
+    """
+    Возвращает статистику кэша: попадания, промахи, вытеснения, объём
+    и количество объединённых (single-flight) запросов
+    """
+    stats = cache_store.stats()
+    stats['single_flight'] = single_flight.stats()
+    stats['stale_while_revalidate'] = refresher.stats()
+    return stats
+
+def cached(prefix, ttl=None, stale_ttl=0, coalesce=False, wait_timeout=None):
     """
-    Декоратор для кэширования результатов функций
+    Декоратор для кэширования результатов функций.
+    В кэше хранится готовое тело JSON-ответа и его ETag: попадание отдаёт
+    байты без повторной сериализации, а запрос с совпадающим If-None-Match
+    получает 304 без тела.
+    Если запрос содержит start_date и end_date, запись привязывается
+    к этому периоду и удаляется при изменении продаж внутри него
+    (см. invalidate_date_range).
+    coalesce=True включает single-flight: при промахе результат вычисляет
+    один запрос, остальные с тем же ключом ждут его не дольше wait_timeout
+    секунд (по умолчанию - CACHE_SINGLE_FLIGHT_TIMEOUT).
+    stale_ttl > 0 включает stale-while-revalidate: ещё stale_ttl секунд после
+    истечения ttl запись отдаётся клиентам, а в фоне запускается её обновление.
+    ttl и stale_ttl могут быть функциями без аргументов: они вызываются
+    при сохранении каждой записи
     """
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return func(*args, **kwargs)
+
             # Для GET запросов берем параметры из request.args
-            if request.method == 'GET':
-                cache_params = {k: v for k, v in request.args.items()}
-                cache_key = generate_cache_key(prefix, **cache_params)
-                
-                # Проверяем наличие в кэше
-                cached_data = get_cache(cache_key)
-                if cached_data:
-                    # Если данные есть в кэше, возвращаем их
-                    print(f"Cache hit for {cache_key}")
-                    return jsonify(cached_data), 200
-            
-            # Если кэша нет или не GET запрос, выполняем функцию
-            result, status_code = func(*args, **kwargs)
-            
-            # Кэшируем только успешные GET запросы
-            if request.method == 'GET' and status_code == 200:
-                cache_key = generate_cache_key(prefix, **cache_params)
-                set_cache(cache_key, result.json)
-                print(f"Cached result for {cache_key}")
-            
-            return result, status_code
+            cache_params = {k: v for k, v in request.args.items()}
+            cache_key = generate_cache_key(prefix, **cache_params)
+
+            def compute():
+                # Если кэша нет, выполняем функцию
+                result, status_code = func(*args, **kwargs)
+                entry = None
+
+                # Кэшируем только успешные запросы
+                if status_code == 200:
+                    body = result.get_data()
+                    fresh_ttl = ttl() if callable(ttl) else ttl
+                    if fresh_ttl is None:
+                        fresh_ttl = cache_store.default_ttl
+                    entry_stale_ttl = stale_ttl() if callable(stale_ttl) else stale_ttl
+                    entry = {
+                        'body': body,
+                        'etag': hashlib.blake2b(body, digest_size=16).hexdigest(),
+                        'fresh_until': time.time() + fresh_ttl
+                    }
+                    set_cache(cache_key, entry, fresh_ttl + entry_stale_ttl, parse_date_window(cache_params))
+
+                return result, status_code, entry
+
+            def respond(result, status_code, entry):
+                if entry is None:
+                    return result, status_code
+                return _cached_response(entry)
+
+            # Проверяем наличие в кэше
+            cached_entry = get_cache(cache_key)
+            if cached_entry:
+                # Устаревшую запись отдаём, но обновляем в фоне
+                if cached_entry['fresh_until'] <= time.time():
+                    record_cache_lookup(prefix, 'stale')
+                    refresher.submit(cache_key, _in_request_context(compute))
+                else:
+                    record_cache_lookup(prefix, 'hit')
+
+                # Если данные есть в кэше, возвращаем их
+                return _cached_response(cached_entry)
+
+            record_cache_lookup(prefix, 'miss')
+            if not coalesce:
+                return respond(*compute())
+
+            flight, is_leader = single_flight.join(cache_key)
+            if not is_leader:
+                timeout = wait_timeout
+                if timeout is None:
+                    timeout = current_app.config.get('CACHE_SINGLE_FLIGHT_TIMEOUT', CACHE_SINGLE_FLIGHT_TIMEOUT)
+                shared_entry = single_flight.wait(flight, timeout)
+                if shared_entry is not None:
+                    return _cached_response(shared_entry)
+
+                # Лидер не успел или не получил кэшируемый результат - вычисляем сами
+                return respond(*compute())
+
+            entry = None
+            try:
+                result, status_code, entry = compute()
+                return respond(result, status_code, entry)
+            finally:
+                single_flight.finish(cache_key, flight, entry)
         return wrapper
-    return decorator 
\ No newline at end of file
+    return decorator
+
+def _cached_response(entry):
+    # Ответ из готовых байтов; при совпадении If-None-Match - 304 без тела
+    response = current_app.response_class(entry['body'], status=200, mimetype='application/json')
+    response.set_etag(entry['etag'])
+    return response.make_conditional(request)
+
+def _in_request_context(func):
+    # Повторяет текущий GET-запрос в отдельном контексте приложения,
+    # чтобы функцию можно было выполнить в фоновом потоке
+    app = current_app._get_current_object()
+    path = request.path
+    query_string = request.query_string
+    base_url = request.host_url
+
+    def run():
+        with app.test_request_context(path, base_url=base_url, query_string=query_string, method='GET'):
+            return func()
+    return run
@@ -0,0 +1,427 @@
+import os
+import time
+import threading
+from collections import namedtuple
+from flask import current_app
+from app import db
+from app.models.models import Sale, Product
+
+try:
+    import numpy as np
+except ImportError:  # numpy - необязательная зависимость
+    np = None
+
+# Начальная ёмкость массивов; при заполнении ёмкость удваивается
+INITIAL_CAPACITY = 1024
+# Сколько строк читается из базы за раз при загрузке
+LOAD_CHUNK_SIZE = 50000
+# Период полной перезагрузки данных в секундах
+ENGINE_MAX_AGE = 60
+# Пауза перед повторной попыткой после неудачной загрузки
+ENGINE_RETRY_INTERVAL = 5
+
+TopProduct = namedtuple('TopProduct', [
+    'product_id', 'name', 'price', 'total_quantity', 'avg_discount', 'total_amount_with_discount'
+])
+
+
+class ColumnarSalesEngine:
+    """
+    Аналитика продаж в памяти процесса: продажи хранятся в компактных
+    массивах NumPy (дата, продукт, количество, скидка), цены - в массиве
+    по product_id. /sales/total и /sales/top-products считаются векторно
+    без обращения к базе. Данные загружает фоновый поток (start), а не
+    запрос; между загрузками они дополняются записями этого процесса.
+    max_age > 0 задаёт период полной перезагрузки, чтобы подхватывать
+    изменения других воркеров
+    """
+
+    # Поля с данными, которые подменяются целиком при перезагрузке
+    STATE = ('_size', '_max_sale_id', '_sale_ids', '_dates', '_product_ids',
+             '_quantities', '_discounts', '_alive', '_prices', '_names')
+
+    def __init__(self, max_age=ENGINE_MAX_AGE):
+        if np is None:
+            raise RuntimeError('ColumnarSalesEngine requires numpy')
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._loaded_at = None
+        # Изменения этого процесса, сделанные во время загрузки (None - загрузка не идёт)
+        self._pending = None
+        self._thread = None
+        self._thread_pid = None
+        self._reset()
+
+    def _reset(self):
+        self._size = 0
+        self._max_sale_id = 0
+        self._sale_ids = np.empty(INITIAL_CAPACITY, dtype=np.int64)
+        self._dates = np.empty(INITIAL_CAPACITY, dtype='datetime64[us]')
+        self._product_ids = np.empty(INITIAL_CAPACITY, dtype=np.int32)
+        self._quantities = np.empty(INITIAL_CAPACITY, dtype=np.int32)
+        # NaN - скидка не задана (NULL)
+        self._discounts = np.empty(INITIAL_CAPACITY, dtype=np.float64)
+        self._alive = np.empty(INITIAL_CAPACITY, dtype=bool)
+        self._prices = np.zeros(1, dtype=np.float64)
+        self._names = {}
+
+    @property
+    def loaded(self):
+        return self._loaded_at is not None
+
+    def load(self):
+        """
+        Загружает все продажи и цены продуктов из базы в новые массивы
+        и подменяет ими текущие. Запросы всё это время считаются по прежним
+        данным; изменения этого процесса, сделанные во время загрузки,
+        повторно применяются к новым массивам
+        """
+        with self._lock:
+            self._pending = []
+        try:
+            fresh = ColumnarSalesEngine(self.max_age)
+            fresh._fill()
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+
+        with self._lock:
+            pending, self._pending = self._pending, None
+            for name in self.STATE:
+                setattr(self, name, getattr(fresh, name))
+            self._loaded_at = time.monotonic()
+            for method, args in pending:
+                getattr(self, method)(*args)
+
+    def _fill(self):
+        for product_id, name, price in db.session.query(Product.product_id, Product.name, Product.price):
+            self._set_product(product_id, name, price)
+
+        rows = db.session.query(
+            Sale.sale_id, Sale.date, Sale.product_id, Sale.quantity, Sale.discount
+        ).order_by(Sale.sale_id).yield_per(LOAD_CHUNK_SIZE)
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == LOAD_CHUNK_SIZE:
+                self._append(chunk)
+                chunk = []
+        if chunk:
+            self._append(chunk)
+
+    def start(self, app):
+        """
+        Запускает в текущем процессе фоновый поток: первая загрузка сразу,
+        затем перезагрузка раз в max_age секунд (0 - только первая).
+        После fork воркера поток запускается заново
+        """
+        with self._lock:
+            if self._thread is not None and self._thread_pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._run, args=(app,), name='columnar-engine', daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+
+    def _run(self, app):
+        while True:
+            try:
+                with app.app_context():
+                    started = time.perf_counter()
+                    self.load()
+                    app.logger.info('Движок аналитики загрузил %d продаж за %.1f с',
+                                    self._size, time.perf_counter() - started)
+            except Exception:
+                app.logger.exception('Не удалось загрузить данные движка аналитики')
+                time.sleep(ENGINE_RETRY_INTERVAL)
+                continue
+            if not self.max_age:
+                return
+            time.sleep(self.max_age)
+
+    def _defer(self, method, *args):
+        # Во время загрузки изменение запоминается, чтобы применить его и к новым массивам
+        if self._pending is not None:
+            self._pending.append((method, args))
+
+    def upsert_sale(self, sale):
+        """
+        Добавляет новую продажу или обновляет существующую
+        """
+        self.upsert_sales([(sale.sale_id, sale.date, sale.product_id, sale.quantity, sale.discount)])
+
+    def upsert_sales(self, rows):
+        """
+        То же для строк (sale_id, date, product_id, quantity, discount);
+        новые продажи добавляются в массивы одним куском
+        """
+        rows = list(rows)
+        with self._lock:
+            self._defer('upsert_sales', rows)
+            if not self.loaded:
+                return
+            new_rows = []
+            for row in rows:
+                sale_id, date, product_id, quantity, discount = row
+                # Новые продажи (id больше всех известных) добавляются без поиска
+                position = self._find(sale_id) if sale_id <= self._max_sale_id else None
+                if position is None:
+                    new_rows.append(row)
+                    continue
+                self._dates[position] = np.datetime64(date, 'us')
+                self._product_ids[position] = product_id
+                self._quantities[position] = quantity
+                self._discounts[position] = np.nan if discount is None else discount
+            if new_rows:
+                self._append(new_rows)
+
+    def remove_sales(self, sale_ids):
+        with self._lock:
+            self._defer('remove_sales', sale_ids)
+            if not self.loaded or not self._size:
+                return
+            self._alive[:self._size] &= ~np.isin(self._sale_ids[:self._size], list(sale_ids))
+
+    def upsert_product(self, product):
+        self.upsert_products([(product.product_id, product.name, product.price)])
+
+    def upsert_products(self, rows):
+        """
+        Обновляет цены и названия по строкам (product_id, name, price)
+        """
+        rows = list(rows)
+        with self._lock:
+            self._defer('upsert_products', rows)
+            if self.loaded:
+                for product_id, name, price in rows:
+                    self._set_product(product_id, name, price)
+
+    def remove_products(self, product_ids):
+        """
+        Удаляет продукты вместе с их продажами
+        """
+        with self._lock:
+            self._defer('remove_products', product_ids)
+            if not self.loaded:
+                return
+            for product_id in product_ids:
+                self._names.pop(product_id, None)
+            if self._size:
+                self._alive[:self._size] &= ~np.isin(self._product_ids[:self._size], list(product_ids))
+
+    def total_sales(self, start, end):
+        """
+        Возвращает (сумма продаж с учётом скидки, средняя скидка) за [start, end]
+        """
+        product_ids, quantities, discounts, prices = self._select(start, end)
+        has_discount = ~np.isnan(discounts)
+        if not has_discount.any():
+            return None, None
+        amounts = quantities[has_discount] * prices[has_discount] * (1 - discounts[has_discount] / 100)
+        return float(amounts.sum()), float(discounts[has_discount].mean())
+
+    def top_products(self, start, end, limit):
+        """
+        Возвращает продукты с наибольшим количеством продаж за [start, end]
+        """
+        product_ids, quantities, discounts, prices = self._select(start, end)
+        if not len(product_ids):
+            return []
+
+        size = int(product_ids.max()) + 1
+        has_discount = ~np.isnan(discounts)
+        safe_discounts = np.where(has_discount, discounts, 0.0)
+
+        sale_counts = np.bincount(product_ids, minlength=size)
+        total_quantity = np.bincount(product_ids, weights=quantities, minlength=size)
+        discount_sum = np.bincount(product_ids, weights=safe_discounts, minlength=size)
+        discount_count = np.bincount(product_ids, weights=has_discount.astype(np.float64), minlength=size)
+        amounts = np.bincount(
+            product_ids, weights=np.where(has_discount, quantities * prices * (1 - safe_discounts / 100), 0.0),
+            minlength=size
+        )
+
+        candidates = np.flatnonzero(sale_counts)
+        if len(candidates) > limit:
+            top = np.argpartition(-total_quantity[candidates], limit - 1)[:limit]
+            candidates = candidates[top]
+        candidates = candidates[np.argsort(-total_quantity[candidates], kind='stable')]
+
+        with self._lock:
+            return [TopProduct(
+                product_id=int(product_id),
+                name=self._names.get(int(product_id)),
+                price=float(self._prices[product_id]),
+                total_quantity=int(total_quantity[product_id]),
+                avg_discount=float(discount_sum[product_id] / discount_count[product_id]) if discount_count[product_id] else None,
+                total_amount_with_discount=float(amounts[product_id]) if discount_count[product_id] else None
+            ) for product_id in candidates]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'loaded': self.loaded,
+                'rows': self._size,
+                'alive_rows': int(self._alive[:self._size].sum()),
+                'bytes': sum(array.nbytes for array in (
+                    self._sale_ids, self._dates, self._product_ids, self._quantities,
+                    self._discounts, self._alive, self._prices
+                ))
+            }
+
+    def _select(self, start, end):
+        with self._lock:
+            size = self._size
+            dates = self._dates[:size]
+            mask = self._alive[:size] & (dates >= np.datetime64(start, 'us')) & (dates <= np.datetime64(end, 'us'))
+            product_ids = self._product_ids[:size][mask]
+            return (
+                product_ids,
+                self._quantities[:size][mask].astype(np.float64),
+                self._discounts[:size][mask],
+                self._prices[product_ids]
+            )
+
+    def _find(self, sale_id):
+        positions = np.flatnonzero(self._sale_ids[:self._size] == sale_id)
+        return int(positions[0]) if len(positions) else None
+
+    def _append(self, rows):
+        count = len(rows)
+        self._reserve(self._size + count)
+        sale_ids, dates, product_ids, quantities, discounts = zip(*rows)
+        end = self._size + count
+        self._sale_ids[self._size:end] = sale_ids
+        self._dates[self._size:end] = np.array(dates, dtype='datetime64[us]')
+        self._product_ids[self._size:end] = product_ids
+        self._quantities[self._size:end] = quantities
+        self._discounts[self._size:end] = np.array(discounts, dtype=np.float64)
+        self._alive[self._size:end] = True
+        self._size = end
+        self._max_sale_id = max(self._max_sale_id, max(sale_ids))
+        # Продажи продуктов, о которых ещё нет данных, не должны выходить за массив цен
+        self._reserve_products(max(product_ids))
+
+    def _reserve(self, capacity):
+        if capacity <= len(self._sale_ids):
+            return
+        new_capacity = max(capacity, 2 * len(self._sale_ids))
+        for name in ('_sale_ids', '_dates', '_product_ids', '_quantities', '_discounts', '_alive'):
+            array = getattr(self, name)
+            grown = np.empty(new_capacity, dtype=array.dtype)
+            grown[:self._size] = array[:self._size]
+            setattr(self, name, grown)
+
+    def _reserve_products(self, product_id):
+        if product_id < len(self._prices):
+            return
+        grown = np.zeros(max(product_id + 1, 2 * len(self._prices)), dtype=np.float64)
+        grown[:len(self._prices)] = self._prices
+        self._prices = grown
+
+    def _set_product(self, product_id, name, price):
+        self._reserve_products(product_id)
+        self._prices[product_id] = float(price)
+        self._names[product_id] = name
+
+
+# Движок включается параметром ANALYTICS_ENGINE = 'numpy'
+columnar_engine = None
+
+
+def init_columnar_engine(app):
+    """
+    Создаёт движок, если он включён в конфигурации и numpy установлен
+    """
+    global columnar_engine
+    columnar_engine = None
+    if app.config.get('ANALYTICS_ENGINE') != 'numpy':
+        return
+    if np is None:
+        app.logger.warning('ANALYTICS_ENGINE=numpy, но numpy не установлен - используется SQL')
+        return
+    columnar_engine = ColumnarSalesEngine(max_age=app.config.get('ANALYTICS_ENGINE_MAX_AGE', ENGINE_MAX_AGE))
+
+def get_columnar_engine():
+    """
+    Возвращает движок для аналитического запроса или None (считать в SQL).
+    Запускает фоновую загрузку в процессе воркера; пока данные
+    не загружены, запросы считаются через SQL
+    """
+    if columnar_engine is None:
+        return None
+    columnar_engine.start(current_app._get_current_object())
+    return columnar_engine if columnar_engine.loaded else None
+
+def result_max_age():
+    """
+    Сколько секунд результат движка может храниться в кэше: он отстаёт
+    от записей других воркеров не больше чем на период перезагрузки.
+    None - ограничения нет (движок выключен или не перезагружается)
+    """
+    if columnar_engine is None or not columnar_engine.max_age:
+        return None
+    return columnar_engine.max_age
+
+def record_sale(sale):
+    if columnar_engine is not None:
+        columnar_engine.upsert_sale(sale)
+
+def record_sales(rows):
+    if columnar_engine is not None:
+        columnar_engine.upsert_sales(rows)
+
+def forget_sales(*sale_ids):
+    if columnar_engine is not None:
+        columnar_engine.remove_sales(sale_ids)
+
+def record_product(product):
+    if columnar_engine is not None:
+        columnar_engine.upsert_product(product)
+
+def record_products(rows):
+    if columnar_engine is not None:
+        columnar_engine.upsert_products(rows)
+
+def forget_products(*product_ids):
+    if columnar_engine is not None:
+        columnar_engine.remove_products(product_ids)
+
+def check_consistency(engine, start, end, limit=10, tolerance=0.01):
+    """
+    Сравнивает результаты движка и SQL-пути за [start, end].
+    Возвращает список расхождений (пустой - результаты совпадают)
+    """
+    from app.utils import rollup
+
+    mismatches = []
+
+    def differs(a, b):
+        return abs((a or 0) - (b or 0)) > tolerance
+
+    sql_total, sql_avg = rollup.total_sales(start, end)
+    total, avg = engine.total_sales(start, end)
+    if differs(total, sql_total and float(sql_total)) or differs(avg, sql_avg):
+        mismatches.append({'metric': 'total_sales', 'engine': [total, avg], 'sql': [sql_total and float(sql_total), sql_avg]})
+
+    sql_top = {row.product_id: row for row in rollup.top_products(start, end, limit)}
+    top = {row.product_id: row for row in engine.top_products(start, end, limit)}
+    for product_id in set(sql_top) | set(top):
+        engine_row, sql_row = top.get(product_id), sql_top.get(product_id)
+        if engine_row is None or sql_row is None:
+            # При равных количествах граница топа может отличаться
+            edge_quantity = min(row.total_quantity for row in (list(top.values()) + list(sql_top.values())))
+            row = engine_row or sql_row
+            if row.total_quantity != edge_quantity:
+                mismatches.append({'metric': 'top_products', 'product_id': product_id, 'engine': bool(engine_row), 'sql': bool(sql_row)})
+            continue
+        if (engine_row.total_quantity != sql_row.total_quantity
+                or differs(engine_row.total_amount_with_discount, sql_row.total_amount_with_discount and float(sql_row.total_amount_with_discount))
+                or differs(engine_row.avg_discount, sql_row.avg_discount)):
+            mismatches.append({
+                'metric': 'top_products',
+                'product_id': product_id,
+                'engine': engine_row._asdict(),
+                'sql': dict(sql_row._mapping)
+            })
+    return mismatches
@@ -0,0 +1,230 @@
+import io
+import csv
+import math
+import time
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from app import db
+from app.models.models import Category, Product, Sale
+from app.utils.rollup import rebuild_rollup
+
+# Сколько продаж генерируется и вставляется за раз
+SEED_CHUNK_SIZE = 50000
+# Показатель распределения Ципфа: доля продаж продукта ~ 1 / rank^ZIPF_EXPONENT
+ZIPF_EXPONENT = 1.1
+
+# Распределение количества в продаже
+QUANTITIES = (1, 2, 3, 4, 5, 10)
+QUANTITY_WEIGHTS = (50, 22, 11, 7, 6, 4)
+# Размеры скидок и вероятность скидки в обычный и акционный день
+DISCOUNTS = (5.0, 10.0, 15.0, 20.0, 25.0, 30.0, 50.0)
+DISCOUNT_WEIGHTS = (25, 30, 15, 12, 8, 7, 3)
+DISCOUNT_PROBABILITY = 0.15
+PROMO_DISCOUNT_PROBABILITY = 0.6
+# Доля продаж по часам суток (ночью продаж мало, пик - вечером)
+HOUR_WEIGHTS = (2, 1, 1, 1, 1, 2, 3, 5, 7, 8, 9, 10, 11, 10, 9, 9, 10, 11, 13, 14, 13, 10, 6, 4)
+# Множитель продаж по дням недели (понедельник - 0)
+WEEKDAY_WEIGHTS = (0.9, 0.9, 0.95, 1.0, 1.15, 1.35, 1.2)
+
+CATEGORY_NAMES = ('Electronics', 'Clothing', 'Books', 'Home', 'Sports', 'Toys', 'Beauty', 'Garden',
+                  'Food', 'Auto', 'Health', 'Music', 'Office', 'Pets', 'Games', 'Jewelry')
+
+
+def is_promo_day(day):
+    """
+    Акционные дни: неделя «чёрной пятницы» и вторая половина декабря
+    """
+    return (day.month == 11 and day.day >= 22) or (day.month == 12 and 15 <= day.day <= 31)
+
+def day_weight(day):
+    """
+    Относительный объём продаж за день: день недели, годовая сезонность
+    с пиком в декабре и провалом летом, всплеск в акционные дни
+    """
+    season = 1 + 0.3 * math.cos(2 * math.pi * (day.timetuple().tm_yday - 350) / 365.25)
+    return WEEKDAY_WEIGHTS[day.weekday()] * season * (1.8 if is_promo_day(day) else 1.0)
+
+def daily_counts(sales, start, days):
+    """
+    Делит sales продаж между днями пропорционально day_weight.
+    Остаток от округления достаётся дням с наибольшей дробной частью
+    """
+    weights = [day_weight(start + timedelta(days=offset)) for offset in range(days)]
+    total = sum(weights)
+    shares = [sales * weight / total for weight in weights]
+    counts = [int(share) for share in shares]
+    remainder = sales - sum(counts)
+    for offset in sorted(range(days), key=lambda i: counts[i] - shares[i])[:remainder]:
+        counts[offset] += 1
+    return counts
+
+def zipf_cum_weights(count, exponent=ZIPF_EXPONENT):
+    cum_weights = []
+    total = 0.0
+    for rank in range(1, count + 1):
+        total += 1 / rank ** exponent
+        cum_weights.append(total)
+    return cum_weights
+
+def _cum_weights(weights):
+    cum_weights = []
+    total = 0
+    for weight in weights:
+        total += weight
+        cum_weights.append(total)
+    return cum_weights
+
+
+def generate_categories(rng, count):
+    rows = []
+    for category_id in range(1, count + 1):
+        name = CATEGORY_NAMES[(category_id - 1) % len(CATEGORY_NAMES)]
+        if category_id > len(CATEGORY_NAMES):
+            name = f'{name} {(category_id - 1) // len(CATEGORY_NAMES) + 1}'
+        rows.append({'category_id': category_id, 'name': name, 'description': f'Сгенерированная категория {name}'})
+    return rows
+
+def generate_products(rng, count, categories, stock=None):
+    """
+    Продукты в случайных категориях, цены с логнормальным распределением
+    (много дешёвых, немного дорогих). stock задаёт одинаковый остаток всем продуктам
+    """
+    rows = []
+    for product_id in range(1, count + 1):
+        rows.append({
+            'product_id': product_id,
+            'sku': f'GEN-{product_id:08d}',
+            'name': f'Product {product_id}',
+            'description': '',
+            'price': round(min(max(rng.lognormvariate(3.5, 1.0), 0.5), 99999.0), 2),
+            'stock': stock if stock is not None else rng.randint(0, 500),
+            'category_id': rng.randint(1, categories)
+        })
+    return rows
+
+def generate_sales(rng, sales, products, start, days, chunk_size=SEED_CHUNK_SIZE, exponent=ZIPF_EXPONENT):
+    """
+    Генерирует кортежи (product_id, quantity, date, discount) в хронологическом
+    порядке кусками по chunk_size. Популярность продуктов распределена по Ципфу:
+    ранги популярности перемешаны, поэтому популярные продукты не совпадают
+    с первыми product_id и разбросаны по категориям
+    """
+    ranked = list(range(1, products + 1))
+    rng.shuffle(ranked)
+    product_cum = zipf_cum_weights(products, exponent)
+    hour_cum = _cum_weights(HOUR_WEIGHTS)
+    quantity_cum = _cum_weights(QUANTITY_WEIGHTS)
+    discount_cum = _cum_weights(DISCOUNT_WEIGHTS)
+    hours = range(24)
+
+    chunk = []
+    for offset, count in enumerate(daily_counts(sales, start, days)):
+        if not count:
+            continue
+        day = start + timedelta(days=offset)
+        discount_probability = PROMO_DISCOUNT_PROBABILITY if is_promo_day(day) else DISCOUNT_PROBABILITY
+        seconds = sorted(
+            hour * 3600 + rng.randrange(3600)
+            for hour in rng.choices(hours, cum_weights=hour_cum, k=count)
+        )
+        product_ids = rng.choices(ranked, cum_weights=product_cum, k=count)
+        quantities = rng.choices(QUANTITIES, cum_weights=quantity_cum, k=count)
+        discounts = rng.choices(DISCOUNTS, cum_weights=discount_cum, k=count)
+        for second, product_id, quantity, discount in zip(seconds, product_ids, quantities, discounts):
+            chunk.append((
+                product_id, quantity, day + timedelta(seconds=second),
+                discount if rng.random() < discount_probability else 0.0
+            ))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def copy_rows(table, columns, rows):
+    """
+    Загружает rows через COPY FROM STDIN в транзакции сессии (PostgreSQL + psycopg2).
+    Возвращает False, если драйвер не поддерживает COPY
+    """
+    cursor = db.session.connection().connection.cursor()
+    if not hasattr(cursor, 'copy_expert'):
+        return False
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([value.isoformat(sep=' ') if isinstance(value, datetime) else value for value in row])
+    buffer.seek(0)
+    cursor.copy_expert(f'COPY {table.name} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)', buffer)
+    return True
+
+def insert_rows(table, columns, rows):
+    """
+    Вставляет кортежи rows: COPY на PostgreSQL, иначе один пакетный INSERT
+    """
+    if db.engine.dialect.name == 'postgresql' and copy_rows(table, columns, rows):
+        return
+    db.session.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+
+def reset_sequences(*tables):
+    """
+    После вставки с явными ключами сдвигает последовательности PostgreSQL,
+    чтобы следующие INSERT без ключа не получили занятые значения
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for table in tables:
+        column = table.primary_key.columns.values()[0]
+        db.session.execute(
+            func.setval(func.pg_get_serial_sequence(table.name, column.name),
+                        func.coalesce(db.session.query(func.max(column)).scalar_subquery(), 0) + 1, False).select()
+        )
+
+
+def seed_database(sales, products, categories, days, seed=0, end=None, stock=None,
+                  chunk_size=SEED_CHUNK_SIZE, exponent=ZIPF_EXPONENT, progress=None):
+    """
+    Заполняет пустую базу синтетическими данными и пересчитывает агрегаты.
+    Продажи охватывают days дней, последний из которых - end (по умолчанию
+    сегодня). При одинаковых параметрах (включая end) генерируются одни
+    и те же данные.
+    Продажи коммитятся кусками по chunk_size; progress(вставлено, всего)
+    вызывается после каждого куска. Возвращает статистику вставки по таблицам
+    """
+    rng = random.Random(seed)
+    end = end or datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    start = end - timedelta(days=days - 1)
+    stats = {}
+
+    def timed(name, insert):
+        started = time.perf_counter()
+        rows = insert()
+        db.session.commit()
+        elapsed = time.perf_counter() - started
+        stats[name] = {'rows': rows, 'seconds': elapsed, 'rows_per_second': rows / elapsed if elapsed else None}
+
+    def insert_table(table, rows):
+        db.session.execute(table.insert(), rows)
+        return len(rows)
+
+    def insert_sales():
+        inserted = 0
+        columns = ('product_id', 'quantity', 'date', 'discount')
+        for chunk in generate_sales(rng, sales, products, start, days, chunk_size, exponent):
+            insert_rows(Sale.__table__, columns, chunk)
+            db.session.commit()
+            inserted += len(chunk)
+            if progress:
+                progress(inserted, sales)
+        return inserted
+
+    category_rows = generate_categories(rng, categories)
+    timed('categories', lambda: insert_table(Category.__table__, category_rows))
+    product_rows = generate_products(rng, products, categories, stock)
+    timed('products', lambda: insert_table(Product.__table__, product_rows))
+    reset_sequences(Category.__table__, Product.__table__)
+    db.session.commit()
+    timed('sales', insert_sales)
+    timed('sales_daily_rollup', rebuild_rollup)
+    return stats
@@ -0,0 +1,143 @@
+import time
+import threading
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+from app import db
+
+
+class PoolMetrics:
+    """
+    Счётчики ожидания соединений из пула: количество выдач, суммарное
+    и максимальное время ожидания, выдачи дольше SLOW_CHECKOUT, тайм-ауты
+    и наибольшее число одновременно выданных соединений
+    """
+    SLOW_CHECKOUT = 0.1
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.slow_checkouts = 0
+            self.timeouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.peak_checked_out = 0
+
+    def observe_checkout(self, wait, checked_out):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            if wait >= self.SLOW_CHECKOUT:
+                self.slow_checkouts += 1
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def observe_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'slow_checkouts': self.slow_checkouts,
+                'timeouts': self.timeouts,
+                'avg_wait_ms': round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0,
+                'max_wait_ms': round(self.wait_max * 1000, 3),
+                'peak_checked_out': self.peak_checked_out
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool, измеряющий время получения соединения (ожидание свободного
+    соединения или открытие нового) и тайм-ауты ожидания
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_metrics.observe_timeout()
+            raise
+        pool_metrics.observe_checkout(time.perf_counter() - started, self.checkedout())
+        return connection
+
+
+def init_db_pool(app):
+    """
+    Подключает измеряемый пул, если база работает с пулом соединений с очередью
+    """
+    # Копия: словарь параметров общий с классом конфигурации
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if 'pool_size' in options:
+        options.setdefault('poolclass', InstrumentedQueuePool)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+def pool_status():
+    """
+    Текущее использование пула соединений и накопленные метрики ожидания
+    """
+    pool = db.engine.pool
+    status = {'class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        status.update(
+            size=pool.size(),
+            capacity=capacity,
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            saturation=round(pool.checkedout() / capacity, 3) if capacity else None
+        )
+    if isinstance(pool, InstrumentedQueuePool):
+        status.update(pool_metrics.stats())
+    return status
+
+
+_ping_lock = threading.Lock()
+_ping_done = threading.Condition(_ping_lock)
+_pinging = False
+_last_ping = None
+
+def ping_database(ttl):
+    """
+    Проверяет базу запросом SELECT 1 и возвращает {'ok', 'latency_ms', 'error', 'age_s'}.
+    Результат переиспользуется ttl секунд, чтобы частые проверки не нагружали базу.
+    Проверку выполняет один поток и без блокировки: пока она идёт (например,
+    ждёт таймаута соединения с недоступной базой), остальные получают
+    предыдущий результат и ждут только самую первую проверку
+    """
+    global _last_ping, _pinging
+    with _ping_lock:
+        now = time.monotonic()
+        if _last_ping is not None and (_pinging or now - _last_ping[0] < ttl):
+            checked_at, result = _last_ping
+            return dict(result, age_s=round(now - checked_at, 3))
+        if _pinging:
+            _ping_done.wait_for(lambda: not _pinging)
+            return ping_database(ttl)
+        _pinging = True
+
+    result = None
+    started = time.perf_counter()
+    try:
+        with db.engine.connect() as connection:
+            connection.exec_driver_sql('SELECT 1')
+        result = {'ok': True, 'latency_ms': round((time.perf_counter() - started) * 1000, 3), 'error': None}
+    except exc.SQLAlchemyError as e:
+        result = {'ok': False, 'latency_ms': None, 'error': str(e)}
+    finally:
+        with _ping_lock:
+            if result is not None:
+                _last_ping = (now, result)
+            _pinging = False
+            _ping_done.notify_all()
+    return dict(result, age_s=round(time.monotonic() - now, 3))
@@ -0,0 +1,94 @@
+import logging
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from flask.json import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # orjson - необязательная зависимость
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# auto - orjson, если установлен, иначе стандартный json
+JSON_PROVIDERS = ('auto', 'orjson', 'stdlib')
+
+_WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+def http_date(value):
+    """
+    Дата в формате RFC 822 ('Wed, 01 Feb 2023 10:00:00 GMT'), как у
+    werkzeug.http.http_date, которым даты сериализует стандартный JSONEncoder
+    Flask, но без форматирования через email.utils. Дата без часового пояса
+    считается датой в UTC
+    """
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return '%s, %02d %s %04d %02d:%02d:%02d GMT' % (
+            _WEEKDAYS[value.weekday()], value.day, _MONTHS[value.month - 1], value.year,
+            value.hour, value.minute, value.second
+        )
+    return '%s, %02d %s %04d 00:00:00 GMT' % (
+        _WEEKDAYS[value.weekday()], value.day, _MONTHS[value.month - 1], value.year
+    )
+
+
+class StdlibJSONEncoder(JSONEncoder):
+    """
+    Стандартный кодировщик Flask с поддержкой Decimal (как число, подобно
+    float(price) в to_dict) и более быстрым форматированием дат
+    """
+
+    def default(self, o):
+        if isinstance(o, date):
+            return http_date(o)
+        if isinstance(o, Decimal):
+            return float(o)
+        return super().default(o)
+
+
+class OrjsonEncoder(StdlibJSONEncoder):
+    """
+    Кодировщик на orjson для flask.json.dumps и jsonify: словари, списки,
+    строки и числа сериализуются в C. Даты передаются в default, чтобы формат
+    совпадал со стандартным кодировщиком. Параметры sort_keys и indent,
+    которые передаёт Flask, переводятся в опции orjson; ensure_ascii
+    не поддерживается - не-ASCII символы выводятся в UTF-8 без экранирования
+    """
+
+    def encode(self, o):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self.indent is not None:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(o, default=self.default, option=option).decode()
+        except orjson.JSONEncodeError:
+            # Например, целые числа больше 64 бит: стандартный кодировщик справится
+            return super().encode(o)
+
+
+def init_json_provider(app):
+    """
+    Устанавливает кодировщик JSON для jsonify по настройке JSON_PROVIDER
+    (auto, orjson, stdlib). Возвращает имя выбранного кодировщика
+    """
+    provider = app.config.get('JSON_PROVIDER', 'auto')
+    if provider not in JSON_PROVIDERS:
+        raise ValueError(f'Unknown JSON_PROVIDER: {provider}')
+    if provider == 'orjson' and orjson is None:
+        raise RuntimeError('JSON_PROVIDER=orjson requires orjson')
+
+    if provider != 'stdlib' and orjson is not None:
+        app.json_encoder = OrjsonEncoder
+        selected = 'orjson'
+    else:
+        app.json_encoder = StdlibJSONEncoder
+        selected = 'stdlib'
+    app.extensions['json_provider'] = selected
+    logger.debug('JSON provider: %s', selected)
+    return selected
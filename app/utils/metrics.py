@@ -0,0 +1,277 @@
+import time
+import bisect
+import threading
+from collections import defaultdict, Counter
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Границы корзин гистограмм по умолчанию (секунды)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Границы корзин для количества запросов к базе за HTTP-запрос
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class _Shard:
+    """
+    Метрики, записанные одним потоком
+    """
+
+    def __init__(self):
+        self.values = defaultdict(float)
+        # ключ -> [количества по корзинам..., +Inf, сумма]
+        self.histograms = {}
+
+
+class MetricsRegistry:
+    """
+    Метрики процесса в формате Prometheus. Каждый поток пишет в свой
+    набор значений без блокировок, при чтении (/metrics) значения всех
+    потоков суммируются. Значения завершившихся потоков переносятся
+    в общий итог, чтобы счётчики не уменьшались
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._retired = _Shard()
+        self._meta = {}
+
+    def describe(self, name, kind, help_text, buckets=None):
+        """
+        Регистрирует метрику: kind - counter, gauge или histogram
+        """
+        self._meta[name] = (kind, help_text, tuple(buckets or LATENCY_BUCKETS))
+
+    def inc(self, name, value=1, **labels):
+        self._shard().values[(name, tuple(sorted(labels.items())))] += value
+
+    def dec(self, name, value=1, **labels):
+        self.inc(name, -value, **labels)
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        shard = self._shard()
+        histogram = shard.histograms.get(key)
+        buckets = self._meta[name][2]
+        if histogram is None:
+            histogram = shard.histograms[key] = [0] * (len(buckets) + 2)
+        histogram[bisect.bisect_left(buckets, value)] += 1
+        histogram[-1] += value
+
+    def collect(self):
+        """
+        Возвращает суммы по всем потокам: (значения, гистограммы)
+        """
+        with self._lock:
+            alive = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                else:
+                    self._merge(self._retired, shard.values.copy(), shard.histograms.copy())
+            self._shards = alive
+
+            values = defaultdict(float, self._retired.values)
+            histograms = {key: list(histogram) for key, histogram in self._retired.histograms.items()}
+            total = _Shard()
+            total.values, total.histograms = values, histograms
+            for _, shard in alive:
+                # copy() словаря выполняется атомарно относительно записи другим потоком
+                self._merge(total, shard.values.copy(), shard.histograms.copy())
+            return total.values, total.histograms
+
+    def render(self):
+        """
+        Текстовый формат Prometheus (exposition format 0.0.4)
+        """
+        values, histograms = self.collect()
+        series = defaultdict(list)
+        for (name, labels), value in values.items():
+            series[name].append((labels, value))
+        for (name, labels), histogram in histograms.items():
+            series[name].append((labels, histogram))
+
+        lines = []
+        for name in sorted(series):
+            kind, help_text, buckets = self._meta.get(name, ('untyped', '', LATENCY_BUCKETS))
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in sorted(series[name], key=lambda item: item[0]):
+                if kind != 'histogram':
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + (float('inf'),), value[:-1]):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else _format_value(bound)
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", le),))} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(value[-1])}')
+                lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._shards = []
+            self._retired = _Shard()
+            self._local = threading.local()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    @staticmethod
+    def _merge(target, values, histograms):
+        for key, value in values.items():
+            target.values[key] += value
+        for key, histogram in histograms.items():
+            current = target.histograms.get(key)
+            if current is None:
+                target.histograms[key] = list(histogram)
+            else:
+                for position, value in enumerate(histogram):
+                    current[position] += value
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+registry = MetricsRegistry()
+
+registry.describe('http_requests_total', 'counter', 'HTTP requests by endpoint and status code')
+registry.describe('http_request_duration_seconds', 'histogram', 'HTTP request latency by endpoint')
+registry.describe('http_requests_in_flight', 'gauge', 'HTTP requests currently being processed')
+registry.describe('http_request_db_queries', 'histogram', 'Database queries issued per HTTP request', QUERY_COUNT_BUCKETS)
+registry.describe('http_request_db_seconds', 'histogram', 'Database time per HTTP request')
+registry.describe('db_queries_total', 'counter', 'Database queries executed')
+registry.describe('db_query_duration_seconds', 'histogram', 'Database query latency')
+registry.describe('cache_requests_total', 'counter', 'Cached endpoint lookups by prefix and result (hit, stale, miss)')
+registry.describe('cache_evictions_total', 'counter', 'Cache entries evicted by the size limits, by prefix')
+
+
+def _endpoint_labels():
+    # Запросы без маршрута (404) объединяются, чтобы не плодить ряды по URL
+    return {
+        'blueprint': request.blueprint or '',
+        'endpoint': request.endpoint or '<unmatched>',
+        'method': request.method
+    }
+
+# Метрики базы в реестре записываются, только если метрики включены (init_metrics)
+_record_db_metrics = False
+# Функции (statement, elapsed), которые вызываются после каждого запроса к базе
+_query_observers = []
+
+def start_db_counters(statements=False):
+    """
+    Начинает счёт запросов к базе текущего HTTP-запроса: g.db_queries,
+    g.db_time и при statements=True - g.db_statements (число выполнений
+    каждого текста запроса). Счётчики обнуляются в начале каждого запроса:
+    несколько запросов могут выполняться в одном контексте приложения
+    (тестовый клиент, команды CLI), и g у них общий
+    """
+    g.db_queries = 0
+    g.db_time = 0.0
+    if statements:
+        g.db_statements = Counter()
+
+def add_query_observer(observer):
+    """
+    Подписывает observer(statement, elapsed) на каждый выполненный запрос
+    """
+    listen_queries()
+    if observer not in _query_observers:
+        _query_observers.append(observer)
+
+def listen_queries():
+    """
+    Подключает замер запросов к базе. Время каждого запроса замеряется
+    один раз и расходится по метрикам, счётчикам HTTP-запроса и подписчикам
+    """
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+def _before_request():
+    g.metrics_started = time.perf_counter()
+    start_db_counters()
+    registry.inc('http_requests_in_flight')
+
+def _after_request(response):
+    g.metrics_status = response.status_code
+    return response
+
+def _teardown_request(error):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return
+    registry.dec('http_requests_in_flight')
+
+    labels = _endpoint_labels()
+    status = g.pop('metrics_status', 500)
+    registry.inc('http_requests_total', status=str(status), **labels)
+    registry.observe('http_request_duration_seconds', time.perf_counter() - started, **labels)
+    registry.observe('http_request_db_queries', g.get('db_queries', 0), **labels)
+    registry.observe('http_request_db_seconds', g.get('db_time', 0.0), **labels)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_query_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['metrics_query_started'].pop()
+    if _record_db_metrics:
+        registry.inc('db_queries_total')
+        registry.observe('db_query_duration_seconds', elapsed)
+    if has_request_context() and 'db_queries' in g:
+        g.db_queries += 1
+        g.db_time += elapsed
+        if 'db_statements' in g:
+            g.db_statements[statement] += 1
+    for observer in _query_observers:
+        observer(statement, elapsed)
+
+def _handle_error(context):
+    # Запрос завершился ошибкой - after_cursor_execute не будет вызван
+    if context.connection is not None and context.connection.info.get('metrics_query_started'):
+        context.connection.info['metrics_query_started'].pop()
+
+def record_cache_lookup(prefix, result):
+    registry.inc('cache_requests_total', prefix=prefix, result=result)
+
+def record_cache_evictions(keys):
+    for key in keys:
+        registry.inc('cache_evictions_total', prefix=key.split(':', 1)[0])
+
+
+def init_metrics(app):
+    """
+    Подключает сбор метрик запросов и базы и публикует их на /metrics
+    """
+    global _record_db_metrics
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    _record_db_metrics = True
+    listen_queries()
+
+    @app.route('/metrics')
+    def metrics():
+        return app.response_class(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
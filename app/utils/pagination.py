@@ -0,0 +1,88 @@
+import json
+import base64
+from datetime import datetime
+from sqlalchemy import tuple_
+from sqlalchemy.sql import Select
+from app import db
+
+# Размер страницы по умолчанию и максимально допустимый
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 1000
+
+
+class PaginationError(ValueError):
+    """
+    Неверные параметры пагинации (limit или cursor)
+    """
+
+
+def get_page_limit(args):
+    """
+    Возвращает размер страницы из параметра limit
+    """
+    limit_str = args.get('limit')
+    if limit_str is None:
+        return DEFAULT_PAGE_LIMIT
+    try:
+        limit = int(limit_str)
+    except ValueError:
+        raise PaginationError('Limit must be a positive integer')
+    if limit <= 0:
+        raise PaginationError('Limit must be a positive integer')
+    return min(limit, MAX_PAGE_LIMIT)
+
+def encode_cursor(values):
+    """
+    Кодирует значения ключа последней строки страницы в непрозрачный курсор
+    """
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+def decode_cursor(cursor, columns):
+    """
+    Декодирует курсор в значения ключа для колонок columns
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+        return [
+            datetime.fromisoformat(value) if column.type.python_type is datetime else value
+            for column, value in zip(columns, values)
+        ]
+    except (ValueError, TypeError):
+        raise PaginationError('Invalid cursor')
+
+def keyset_paginate(query, columns, args, descending=False):
+    """
+    Постраничная выборка по ключу (keyset) из Query или Core select: строки
+    упорядочиваются по columns, следующая страница начинается строго после
+    ключа из курсора, поэтому стоимость страницы не зависит от её номера.
+    Возвращает (строки, {'limit': ..., 'next_cursor': ...})
+    """
+    limit = get_page_limit(args)
+
+    cursor = args.get('cursor')
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        if len(columns) == 1:
+            key, bound = columns[0], values[0]
+        else:
+            key, bound = tuple_(*columns), tuple_(*values)
+        query = query.filter(key < bound if descending else key > bound)
+
+    order = [column.desc() if descending else column.asc() for column in columns]
+    # Берём на одну строку больше, чтобы узнать, есть ли следующая страница
+    query = query.order_by(*order).limit(limit + 1)
+    # Core select возвращает кортежи строк без ORM-объектов и identity map
+    rows = db.session.execute(query).all() if isinstance(query, Select) else query.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], column.key) for column in columns])
+
+    return rows, {
+        'limit': limit,
+        'next_cursor': next_cursor
+    }
@@ -0,0 +1,149 @@
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from flask import g, request, current_app
+from app.utils.metrics import start_db_counters, add_query_observer, listen_queries
+
+# Бюджет запросов к базе на HTTP-запрос по умолчанию
+QUERY_BUDGET = 50
+# Сколько раз один и тот же запрос может повториться с разными параметрами (признак N+1)
+QUERY_REPEAT_LIMIT = 10
+QUERY_BUDGET_MODES = ('off', 'log', 'raise')
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Превышен бюджет запросов к базе или обнаружен повторяющийся запрос (N+1)
+    """
+
+
+class QueryTracker:
+    """
+    Запросы к базе, выполненные за время наблюдения: количество, суммарное
+    время и число выполнений каждого текста запроса
+    """
+
+    def __init__(self, count=0, time=0.0, statements=None):
+        self.count = count
+        self.time = time
+        self.statements = Counter() if statements is None else statements
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.time += elapsed
+        self.statements[statement] += 1
+
+    @property
+    def max_repeat(self):
+        return max(self.statements.values(), default=0)
+
+    def repeated(self, limit):
+        """
+        Запросы, выполненные больше limit раз: [(текст, количество)]
+        """
+        return [(statement, count) for statement, count in self.statements.most_common() if count > limit]
+
+    def violations(self, budget, repeat_limit):
+        messages = []
+        if budget is not None and self.count > budget:
+            messages.append(f'{self.count} queries, budget is {budget}')
+        for statement, count in self.repeated(repeat_limit):
+            messages.append(f'statement repeated {count} times (possible N+1): {" ".join(statement.split())[:200]}')
+        return messages
+
+
+_local = threading.local()
+
+def _record_tracked(statement, elapsed):
+    # Запросы получают трекеры track_queries текущего потока; время замеряет app/utils/metrics.py
+    for tracker in getattr(_local, 'trackers', ()):
+        tracker.record(statement, elapsed)
+
+@contextmanager
+def track_queries():
+    """
+    Считает запросы к базе, выполненные текущим потоком внутри блока:
+
+        with track_queries() as tracker:
+            ...
+        tracker.count, tracker.time, tracker.max_repeat
+    """
+    add_query_observer(_record_tracked)
+    tracker = QueryTracker()
+    if not hasattr(_local, 'trackers'):
+        _local.trackers = []
+    trackers = _local.trackers
+    trackers.append(tracker)
+    try:
+        yield tracker
+    finally:
+        trackers.remove(tracker)
+
+@contextmanager
+def assert_max_queries(budget, repeat_limit=QUERY_REPEAT_LIMIT):
+    """
+    То же, что track_queries, но по выходу из блока проверяет бюджет
+    и повторы запросов; при нарушении - QueryBudgetExceeded
+    """
+    with track_queries() as tracker:
+        yield tracker
+    violations = tracker.violations(budget, repeat_limit)
+    if violations:
+        raise QueryBudgetExceeded('; '.join(violations))
+
+
+def budget_for(app, endpoint):
+    """
+    Бюджет запросов эндпоинта: QUERY_BUDGETS[endpoint] или QUERY_BUDGET
+    """
+    return app.config.get('QUERY_BUDGETS', {}).get(endpoint, app.config.get('QUERY_BUDGET', QUERY_BUDGET))
+
+def _settings(config):
+    mode = config.get('QUERY_BUDGET_MODE', 'log')
+    if mode not in QUERY_BUDGET_MODES:
+        raise ValueError(f'Unknown QUERY_BUDGET_MODE: {mode}')
+    return mode, config.get('QUERY_DEBUG_HEADERS', False)
+
+def init_query_budget(app):
+    """
+    Проверяет бюджет запросов к базе эндпоинта (QUERY_BUDGET_MODE:
+    off - не проверять, log - предупреждение в лог, raise - исключение)
+    и при QUERY_DEBUG_HEADERS добавляет отладочные заголовки X-DB-*.
+    Запросы считаются общими счётчиками HTTP-запроса из app/utils/metrics.py.
+    Настройки читаются в каждом запросе, поэтому их можно менять
+    в app.config после create_app (команды CLI, тесты, бенчмарки)
+    """
+    _settings(app.config)
+    listen_queries()
+
+    @app.before_request
+    def start_query_tracking():
+        mode, debug_headers = _settings(current_app.config)
+        if mode == 'off' and not debug_headers:
+            g.pop('db_statements', None)
+            return
+        start_db_counters(statements=True)
+
+    @app.after_request
+    def check_query_budget(response):
+        if 'db_statements' not in g:
+            return response
+        mode, debug_headers = _settings(current_app.config)
+        tracker = QueryTracker(g.db_queries, g.db_time, g.db_statements)
+
+        if debug_headers:
+            response.headers['X-DB-Queries'] = str(tracker.count)
+            response.headers['X-DB-Time-Ms'] = f'{tracker.time * 1000:.2f}'
+            response.headers['X-DB-Max-Repeat'] = str(tracker.max_repeat)
+
+        if mode != 'off' and request.endpoint:
+            violations = tracker.violations(
+                budget_for(app, request.endpoint),
+                app.config.get('QUERY_REPEAT_LIMIT', QUERY_REPEAT_LIMIT)
+            )
+            if violations:
+                message = f'Query budget exceeded in {request.method} {request.path} ({request.endpoint}): ' + '; '.join(violations)
+                if mode == 'raise':
+                    raise QueryBudgetExceeded(message)
+                app.logger.warning(message)
+        return response
@@ -0,0 +1,104 @@
+import re
+from contextlib import contextmanager
+from datetime import timedelta
+from sqlalchemy import event
+from app import db
+from app.models.models import Sale, Product
+from app.utils.cache import clear_cache
+
+
+@contextmanager
+def capture_statements():
+    """
+    Собирает SELECT-запросы (текст и параметры), выполненные внутри блока
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+def explain(statement, parameters):
+    """
+    Возвращает план запроса построчно (PostgreSQL и SQLite)
+    """
+    dialect = db.engine.dialect.name
+    with db.engine.connect() as connection:
+        if dialect == 'postgresql':
+            return [row[0] for row in connection.exec_driver_sql('EXPLAIN ' + statement, parameters)]
+        if dialect == 'sqlite':
+            return [row[-1] for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)]
+    raise RuntimeError(f'EXPLAIN is not supported for {dialect}')
+
+def full_scans(plan):
+    """
+    Возвращает таблицы, которые план читает целиком
+    """
+    tables = set()
+    for line in plan:
+        # PostgreSQL: "Seq Scan on sales", SQLite: "SCAN sales" (без "USING ... INDEX")
+        match = re.search(r'Seq Scan on (\w+)', line)
+        if match:
+            tables.add(match.group(1))
+            continue
+        match = re.match(r'\s*SCAN (?:TABLE )?(\w+)(.*)', line)
+        if match and 'USING' not in match.group(2):
+            tables.add(match.group(1))
+    return tables
+
+def plan_scenarios():
+    """
+    Запросы горячих путей аналитики и списков: (название, URL, таблицы,
+    которые не должны читаться целиком). Период - последние 7 дней продаж,
+    начало в середине дня, чтобы задействовать и агрегаты, и края периода
+    """
+    first, last = Sale.date_span()
+    if last is None:
+        raise RuntimeError('No sales data: seed the database first')
+    product_id = db.session.query(Sale.product_id).order_by(Sale.sale_id.desc()).limit(1).scalar()
+    category_id = db.session.query(Product.category_id).filter(Product.product_id == product_id).scalar()
+
+    start = (last - timedelta(days=7)).replace(hour=12, minute=0, second=0, microsecond=0)
+    period = f'start_date={start.isoformat()}&end_date={last.isoformat()}'
+    sales = ('sales', 'sales_daily_rollup')
+    return [
+        ('sales_total', f'/api/sales/total?{period}', sales),
+        ('top_products', f'/api/sales/top-products?{period}&limit=10', sales),
+        ('timeseries_day', f'/api/sales/timeseries?{period}&granularity=day', sales),
+        ('timeseries_hour', f'/api/sales/timeseries?{period}&granularity=hour', sales),
+        ('timeseries_product', f'/api/sales/timeseries?{period}&product_id={product_id}', sales),
+        ('sales_by_period', f'/api/sales?{period}&sort=date', ('sales',)),
+        ('sales_by_product', f'/api/sales?product_id={product_id}', ('sales',)),
+        ('products_by_category', f'/api/products?category_id={category_id}', ('products',)),
+        ('categories', '/api/categories', ('products',)),
+    ]
+
+def check_query_plans(app):
+    """
+    Выполняет сценарии через тестовый клиент, перехватывает их запросы
+    и возвращает по каждому запросу план и недопустимые полные чтения таблиц
+    """
+    client = app.test_client()
+    reports = []
+    for name, url, tables in plan_scenarios():
+        clear_cache()
+        with capture_statements() as statements:
+            response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f'{name}: GET {url} returned {response.status_code}')
+        for statement, parameters in statements:
+            plan = explain(statement, parameters)
+            reports.append({
+                'scenario': name,
+                'url': url,
+                'statement': statement,
+                'plan': plan,
+                'full_scans': sorted(full_scans(plan) & set(tables))
+            })
+    return reports
@@ -0,0 +1,204 @@
+from datetime import datetime, time, timedelta
+from sqlalchemy import func, select, union_all, case, desc, literal
+from app import db
+from app.models.models import Sale, Product, SalesDailyRollup
+
+
+def full_days(start, end):
+    """
+    Возвращает (первый, последний) день, целиком входящие в период [start, end].
+    Если таких дней нет, первый день больше последнего
+    """
+    first_day = start.date() if start.time() == time.min else start.date() + timedelta(days=1)
+    last_day = end.date() if end.time() == time.max else end.date() - timedelta(days=1)
+    return first_day, last_day
+
+def sales_parts(start, end, use_rollup=True):
+    """
+    Подзапрос с агрегируемыми величинами продаж за [start, end]:
+    целые дни читаются из sales_daily_rollup, неполные дни на краях - из sales.
+    Колонки: date, product_id, quantity, discounted_quantity, discount_sum, discount_count
+    """
+    first_day, last_day = full_days(start, end)
+    parts = []
+
+    if use_rollup and first_day <= last_day:
+        rollup = SalesDailyRollup
+        parts.append(select(
+            rollup.day.label('date'),
+            rollup.product_id,
+            rollup.quantity,
+            rollup.discounted_quantity,
+            rollup.discount_sum,
+            rollup.discount_count
+        ).where(
+            rollup.day >= first_day,
+            rollup.day <= last_day
+        ))
+        edges = [
+            (Sale.date >= start, Sale.date < datetime.combine(first_day, time.min)),
+            (Sale.date >= datetime.combine(last_day + timedelta(days=1), time.min), Sale.date <= end)
+        ]
+    else:
+        edges = [(Sale.date >= start, Sale.date <= end)]
+
+    for criteria in edges:
+        parts.append(select(
+            Sale.date,
+            Sale.product_id,
+            Sale.quantity,
+            (Sale.quantity * (1 - Sale.discount / 100)).label('discounted_quantity'),
+            Sale.discount.label('discount_sum'),
+            case((Sale.discount.isnot(None), 1), else_=literal(0)).label('discount_count')
+        ).where(*criteria))
+
+    return union_all(*parts).subquery('sales_parts')
+
+def total_sales(start, end):
+    """
+    Возвращает (сумма продаж с учётом скидки, средняя скидка) за [start, end]
+    """
+    parts = sales_parts(start, end)
+    result = db.session.execute(
+        select(
+            func.sum(Product.price * parts.c.discounted_quantity).label('total_amount_with_discount'),
+            func.sum(parts.c.discount_sum).label('discount_sum'),
+            func.sum(parts.c.discount_count).label('discount_count')
+        ).join_from(parts, Product, parts.c.product_id == Product.product_id)
+    ).one()
+
+    avg_discount = result.discount_sum / result.discount_count if result.discount_count else None
+    return result.total_amount_with_discount, avg_discount
+
+def top_products(start, end, limit):
+    """
+    Возвращает продукты с наибольшим количеством продаж за [start, end]
+    """
+    parts = sales_parts(start, end)
+    total_quantity = func.sum(parts.c.quantity).label('total_quantity')
+    return db.session.execute(
+        select(
+            Product.product_id,
+            Product.name,
+            Product.price,
+            total_quantity,
+            (func.sum(parts.c.discount_sum) / func.nullif(func.sum(parts.c.discount_count), 0)).label('avg_discount'),
+            func.sum(Product.price * parts.c.discounted_quantity).label('total_amount_with_discount')
+        ).join_from(
+            parts, Product, parts.c.product_id == Product.product_id
+        ).group_by(
+            Product.product_id
+        ).order_by(
+            desc(total_quantity)
+        ).limit(limit)
+    ).all()
+
+# Допустимая детализация временного ряда
+GRANULARITIES = ('hour', 'day', 'week', 'month')
+
+def truncate(value, granularity):
+    """
+    Возвращает начало интервала (часа, дня, недели с понедельника, месяца), содержащего value
+    """
+    value = value.replace(minute=0, second=0, microsecond=0)
+    if granularity == 'hour':
+        return value
+    value = value.replace(hour=0)
+    if granularity == 'week':
+        return value - timedelta(days=value.weekday())
+    if granularity == 'month':
+        return value.replace(day=1)
+    return value
+
+def bucket_starts(start, end, granularity):
+    """
+    Перечисляет начала всех интервалов, пересекающихся с [start, end]
+    """
+    bucket = truncate(start, granularity)
+    while bucket <= end:
+        yield bucket
+        if granularity == 'month':
+            bucket = bucket.replace(year=bucket.year + bucket.month // 12, month=bucket.month % 12 + 1)
+        else:
+            bucket += timedelta(hours=1) if granularity == 'hour' else timedelta(days=7 if granularity == 'week' else 1)
+
+def bucket_expression(column, granularity):
+    """
+    SQL-выражение начала интервала для даты column
+    """
+    if db.engine.dialect.name == 'sqlite':
+        formats = {
+            'hour': ('%Y-%m-%d %H:00:00',),
+            'day': ('%Y-%m-%d 00:00:00',),
+            'week': ('%Y-%m-%d 00:00:00', 'weekday 0', '-6 days'),
+            'month': ('%Y-%m-01 00:00:00',)
+        }
+        fmt, *modifiers = formats[granularity]
+        return func.strftime(fmt, column, *modifiers)
+    return func.date_trunc(granularity, column)
+
+def sales_timeseries(start, end, granularity, product_id=None, category_id=None):
+    """
+    Возвращает агрегаты продаж за [start, end] по интервалам одним запросом:
+    строки (bucket, total_quantity, total_amount_with_discount, discount_sum, discount_count).
+    Почасовой ряд считается по sales, остальные - по дневным агрегатам
+    """
+    parts = sales_parts(start, end, use_rollup=granularity != 'hour')
+    bucket = bucket_expression(parts.c.date, granularity).label('bucket')
+
+    query = select(
+        bucket,
+        func.sum(parts.c.quantity).label('total_quantity'),
+        func.sum(Product.price * parts.c.discounted_quantity).label('total_amount_with_discount'),
+        func.sum(parts.c.discount_sum).label('discount_sum'),
+        func.sum(parts.c.discount_count).label('discount_count')
+    ).join_from(
+        parts, Product, parts.c.product_id == Product.product_id
+    ).group_by(
+        bucket
+    ).order_by(
+        bucket
+    )
+    if product_id is not None:
+        query = query.where(parts.c.product_id == product_id)
+    if category_id is not None:
+        query = query.where(Product.category_id == category_id)
+
+    rows = []
+    for row in db.session.execute(query):
+        # SQLite возвращает начало интервала строкой
+        value = datetime.fromisoformat(row.bucket) if isinstance(row.bucket, str) else row.bucket
+        rows.append((value, row.total_quantity, row.total_amount_with_discount, row.discount_sum, row.discount_count))
+    return rows
+
+def rebuild_rollup(start_day=None, end_day=None):
+    """
+    Пересчитывает sales_daily_rollup из sales (целиком или за дни [start_day, end_day])
+    и возвращает количество записанных строк. Коммит - на вызывающей стороне
+    """
+    table = SalesDailyRollup.__table__
+    day = func.date(Sale.date)
+
+    delete = table.delete()
+    source = select(
+        day,
+        Sale.product_id,
+        func.sum(Sale.quantity),
+        func.coalesce(func.sum(Sale.quantity * (1 - Sale.discount / 100)), 0.0),
+        func.coalesce(func.sum(Sale.discount), 0.0),
+        func.count(Sale.discount),
+        func.count()
+    ).group_by(day, Sale.product_id)
+
+    if start_day is not None:
+        delete = delete.where(table.c.day >= start_day)
+        source = source.where(Sale.date >= datetime.combine(start_day, time.min))
+    if end_day is not None:
+        delete = delete.where(table.c.day <= end_day)
+        source = source.where(Sale.date < datetime.combine(end_day + timedelta(days=1), time.min))
+
+    db.session.execute(delete)
+    return db.session.execute(table.insert().from_select(
+        ['day', 'product_id', 'quantity', 'discounted_quantity', 'discount_sum', 'discount_count', 'sale_count'],
+        source
+    )).rowcount
@@ -0,0 +1,59 @@
+from sqlalchemy import Float, Numeric
+
+
+class FieldsError(ValueError):
+    """
+    Неверный параметр fields
+    """
+
+
+def select_fields(args, columns):
+    """
+    Колонки из columns, перечисленные в параметре fields через запятую
+    (в порядке columns). Без параметра - все columns
+    """
+    value = args.get('fields')
+    if value is None:
+        return columns
+    
+    names = {name.strip() for name in value.split(',') if name.strip()}
+    if not names:
+        raise FieldsError('fields must list at least one field')
+    available = [column.key for column in columns]
+    unknown = sorted(names.difference(available))
+    if unknown:
+        raise FieldsError(f'Unknown fields: {", ".join(unknown)}. Allowed values: {", ".join(available)}')
+    return tuple(column for column in columns if column.key in names)
+
+def with_columns(columns, extra):
+    """
+    columns и недостающие из extra (например, ключ пагинации) в конце списка:
+    rows_to_dicts отбрасывает такие хвостовые колонки
+    """
+    keys = {column.key for column in columns}
+    return tuple(columns) + tuple(column for column in extra if column.key not in keys)
+
+
+def rows_to_dicts(rows, columns):
+    """
+    Превращает строки выборки колонок columns (кортежи Core) в словари
+    {ключ колонки: значение} того же вида, что to_dict моделей:
+    значения Numeric (Decimal) приводятся к float. Колонки строки
+    после columns (см. with_columns) в словарь не попадают
+    """
+    keys = tuple(column.key for column in columns)
+    numeric = [
+        index for index, column in enumerate(columns)
+        if isinstance(column.type, Numeric) and not isinstance(column.type, Float)
+    ]
+    if not numeric:
+        return [dict(zip(keys, row)) for row in rows]
+    
+    result = []
+    for row in rows:
+        values = list(row)
+        for index in numeric:
+            if values[index] is not None:
+                values[index] = float(values[index])
+        result.append(dict(zip(keys, values)))
+    return result
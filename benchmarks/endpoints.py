@@ -0,0 +1,387 @@
+"""
+Бенчмарк эндпоинтов API на сгенерированных данных заданного объёма.
+
+Приложение собирается через create_app и работает с локальной базой
+(по умолчанию - файл SQLite во временном каталоге, переиспользуемый между
+запусками с теми же параметрами). Для каждого эндпоинта измеряются
+пропускная способность и задержки p50/p95/p99, для аналитики - отдельно
+с холодным и прогретым кэшем. Результат пишется в JSON; с --baseline
+прогон сравнивается с сохранённым результатом другого коммита и
+завершается с кодом 1 при регрессии.
+
+Запуск:
+    python benchmarks/endpoints.py --sales 1000000 --output bench.json
+    python benchmarks/endpoints.py --sales 1000000 --baseline bench.json
+    python benchmarks/endpoints.py --database postgresql://... --sales 10000000 --only sales.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import itertools
+import threading
+import subprocess
+from collections import Counter
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Конец периода сгенерированных продаж: данные не зависят от даты запуска
+DATASET_END = datetime(2024, 1, 1)
+PERCENTILES = (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def prepare_dataset(app, args):
+    """
+    Создаёт схему и данные или переиспользует уже заполненную базу
+    """
+    from sqlalchemy import func
+    from app import db
+    from app.models.models import Category, Product, Sale
+    from app.utils.data_generator import seed_database
+
+    with app.app_context():
+        if args.reseed:
+            db.drop_all()
+        db.create_all()
+        seeded = False
+        seed_seconds = None
+        if db.session.query(Category.category_id).first() is None:
+            started = time.perf_counter()
+            # Остатка хватает на все продажи, которые сделает бенчмарк
+            seed_database(args.sales, args.products, args.categories, args.days,
+                          seed=args.seed, end=DATASET_END, stock=10 ** 6)
+            seed_seconds = round(time.perf_counter() - started, 2)
+            seeded = True
+        counts = {
+            'categories': db.session.query(func.count(Category.category_id)).scalar(),
+            'products': db.session.query(func.count(Product.product_id)).scalar(),
+            'sales': db.session.query(func.count(Sale.sale_id)).scalar()
+        }
+        return {
+            'seeded': seeded,
+            'seed_seconds': seed_seconds,
+            'counts': counts,
+            'date_span': [value.isoformat() if value else None for value in Sale.date_span()]
+        }
+
+
+class Scenario:
+    """
+    Один измеряемый запрос. url и body - значения или функции (номер запроса, состояние).
+    collect - ключ состояния, куда складываются идентификаторы созданных объектов,
+    requires - ключ состояния, без которого сценарий пропускается.
+    cache - 'cold' (кэш очищается перед каждым запросом) или 'warm' (кэш прогрет)
+    """
+
+    def __init__(self, name, method, url, body=None, cache=None, collect=None, requires=None):
+        self.name = name
+        self.method = method
+        self.url = url
+        self.body = body
+        self.cache = cache
+        self.collect = collect
+        self.requires = requires
+        self.write = method != 'GET'
+
+    def request(self, index, state):
+        url = self.url(index, state) if callable(self.url) else self.url
+        body = self.body(index, state) if callable(self.body) else self.body
+        return url, body
+
+
+def _created(key, index, state):
+    # Идентификатор объекта, созданного предыдущим сценарием
+    ids = state[key]
+    return ids[index % len(ids)]
+
+def scenarios(counts, date_span, batch_size):
+    """
+    Сценарии для всех эндпоинтов. Сначала чтение, затем запись: объекты,
+    созданные сценариями записи, изменяются и удаляются следующими сценариями
+    """
+    products = counts['products']
+    end = datetime.fromisoformat(date_span[1]) if date_span[1] else DATASET_END
+    start = datetime.fromisoformat(date_span[0]) if date_span[0] else end - timedelta(days=365)
+    month = f'start_date={(end - timedelta(days=30)).date().isoformat()}&end_date={end.date().isoformat()}'
+    year = f'start_date={start.date().isoformat()}&end_date={end.date().isoformat()}'
+
+    def product_id(index, state):
+        return 1 + index % products
+
+    reads = [
+        Scenario('categories.list', 'GET', '/api/categories?limit=100'),
+        Scenario('categories.get', 'GET', lambda i, s: f'/api/categories/{1 + i % counts["categories"]}'),
+        Scenario('products.list', 'GET', '/api/products?limit=100'),
+        Scenario('products.list_by_category', 'GET', lambda i, s: f'/api/products?category_id={1 + i % counts["categories"]}&limit=100'),
+        Scenario('products.get', 'GET', lambda i, s: f'/api/products/{product_id(i, s)}'),
+        Scenario('sales.list', 'GET', '/api/sales?limit=100'),
+        Scenario('sales.list_by_date', 'GET', f'/api/sales?{month}&sort=-date&limit=100'),
+        Scenario('sales.list_by_product', 'GET', lambda i, s: f'/api/sales?product_id={product_id(i, s)}&{year}&limit=100'),
+        Scenario('sales.get', 'GET', lambda i, s: f'/api/sales/{1 + i % max(counts["sales"], 1)}'),
+        Scenario('sales.export_product', 'GET', lambda i, s: f'/api/sales/export?format=csv&product_id={product_id(i, s)}&{month}'),
+        Scenario('sales.cache_stats', 'GET', '/api/sales/cache/stats'),
+    ]
+    analytics = []
+    for window_name, window in (('month', month), ('year', year)):
+        for cache in ('cold', 'warm'):
+            analytics.extend([
+                Scenario(f'sales.total.{window_name}.{cache}', 'GET', f'/api/sales/total?{window}', cache=cache),
+                Scenario(f'sales.top_products.{window_name}.{cache}', 'GET', f'/api/sales/top-products?{window}&limit=10', cache=cache),
+                Scenario(f'sales.timeseries.{window_name}.{cache}', 'GET', f'/api/sales/timeseries?{window}&granularity=day', cache=cache),
+            ])
+    writes = [
+        Scenario('categories.create', 'POST', '/api/categories',
+                 lambda i, s: {'name': f'bench-category-{i}'}, collect='categories'),
+        Scenario('categories.update', 'PUT', lambda i, s: f'/api/categories/{_created("categories", i, s)}',
+                 lambda i, s: {'description': f'updated {i}'}, requires='categories'),
+        Scenario('products.create', 'POST', '/api/products',
+                 lambda i, s: {'name': f'bench-product-{i}', 'price': 10, 'stock': 10 ** 6, 'category_id': 1},
+                 collect='products'),
+        Scenario('products.update', 'PUT', lambda i, s: f'/api/products/{_created("products", i, s)}',
+                 lambda i, s: {'price': 10 + i % 7}, requires='products'),
+        Scenario('products.bulk', 'POST', '/api/products/bulk', lambda i, s: {'products': [
+            {'sku': f'bench-sku-{n}', 'name': f'bench-sku-{n}', 'price': 1 + (i + n) % 5, 'category_id': 1}
+            for n in range(batch_size)
+        ]}, collect='bulk_products'),
+        Scenario('sales.create', 'POST', '/api/sales',
+                 lambda i, s: {'product_id': product_id(i, s), 'quantity': 1, 'date': (end - timedelta(minutes=i)).isoformat()},
+                 collect='sales'),
+        Scenario('sales.batch', 'POST', '/api/sales/batch', lambda i, s: {'sales': [
+            {'product_id': product_id(i * batch_size + n, s), 'quantity': 1, 'date': (end - timedelta(minutes=n)).isoformat()}
+            for n in range(batch_size)
+        ]}, collect='batch_sales'),
+        Scenario('sales.update', 'PUT', lambda i, s: f'/api/sales/{_created("sales", i, s)}',
+                 lambda i, s: {'quantity': 1 + i % 3}, requires='sales'),
+        Scenario('sales.delete', 'DELETE', lambda i, s: f'/api/sales/{_created("sales", i, s)}', requires='sales'),
+        Scenario('products.delete', 'DELETE', lambda i, s: f'/api/products/{_created("products", i, s)}', requires='products'),
+        Scenario('categories.delete', 'DELETE', lambda i, s: f'/api/categories/{_created("categories", i, s)}', requires='categories'),
+        Scenario('sales.cache_clear', 'POST', '/api/sales/cache/clear'),
+    ]
+    return reads + analytics + writes
+
+
+def collect_ids(response, key, state):
+    payload = response.get_json(silent=True) or {}
+    data = payload.get('data')
+    ids = state.setdefault(key, [])
+    if key in ('categories', 'products', 'sales') and isinstance(data, dict):
+        ids.append(data.get({'categories': 'category_id', 'products': 'product_id', 'sales': 'sale_id'}[key]))
+    elif isinstance(data, dict):
+        for result in data.get('results', []):
+            item_id = result.get('product_id') or (result.get('data') or {}).get('sale_id')
+            if item_id is not None and item_id not in ids:
+                ids.append(item_id)
+
+def measure(app, scenario, state, args):
+    """
+    Выполняет scenario args.requests раз и возвращает статистику задержек
+    """
+    requests = args.requests
+    # Удаляется не больше объектов, чем было создано
+    if scenario.method == 'DELETE':
+        requests = min(requests, len(state[scenario.requires]))
+    # Очистка кэша перед каждым запросом не совместима с параллельными клиентами
+    threads = 1 if scenario.cache == 'cold' else args.threads
+
+    client = app.test_client()
+    if not scenario.write:
+        for index in range(args.warmup):
+            url, body = scenario.request(index, state)
+            client.open(url, method=scenario.method, json=body)
+    if scenario.cache == 'warm':
+        url, body = scenario.request(0, state)
+        client.open(url, method=scenario.method, json=body)
+
+    counter = itertools.count()
+    lock = threading.Lock()
+    statuses = Counter()
+    latencies = []
+
+    def worker():
+        client = app.test_client()
+        while True:
+            index = next(counter)
+            if index >= requests:
+                return
+            url, body = scenario.request(index if scenario.cache != 'warm' else 0, state)
+            if scenario.cache == 'cold':
+                client.post('/api/sales/cache/clear')
+            started = time.perf_counter()
+            response = client.open(url, method=scenario.method, json=body)
+            response.get_data()
+            elapsed = time.perf_counter() - started
+            with lock:
+                statuses[response.status_code] += 1
+                latencies.append(elapsed)
+                if scenario.collect and response.status_code < 300:
+                    collect_ids(response, scenario.collect, state)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'method': scenario.method,
+        'cache': scenario.cache,
+        'requests': len(latencies),
+        'threads': threads,
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed and latencies else None,
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+            **{name: round(percentile(latencies, fraction) * 1000, 3) if latencies else None
+               for name, fraction in PERCENTILES},
+            'max': round(max(latencies) * 1000, 3) if latencies else None
+        }
+    }
+
+def cleanup(app, state):
+    """
+    Удаляет объекты, созданные сценариями записи и не удалённые ими,
+    чтобы база оставалась пригодной для следующих прогонов
+    """
+    client = app.test_client()
+    for key, url in (('batch_sales', '/api/sales/{}'), ('sales', '/api/sales/{}'),
+                     ('bulk_products', '/api/products/{}'), ('products', '/api/products/{}'),
+                     ('categories', '/api/categories/{}')):
+        for item_id in state.get(key, []):
+            client.delete(url.format(item_id))
+
+
+def compare(results, baseline, max_regression, min_delta_ms):
+    """
+    Эндпоинты, у которых p95 вырос или пропускная способность упала
+    больше чем на max_regression относительно baseline. Рост p95 меньше
+    min_delta_ms считается шумом измерения
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous or not result['requests'] or not previous.get('requests'):
+            continue
+        p95, previous_p95 = result['latency_ms']['p95'], previous['latency_ms']['p95']
+        if previous_p95 and p95 > previous_p95 * (1 + max_regression) and p95 - previous_p95 >= min_delta_ms:
+            regressions.append({'scenario': name, 'metric': 'p95_ms', 'baseline': previous_p95, 'current': p95})
+        rps, previous_rps = result['throughput_rps'], previous.get('throughput_rps')
+        if previous_rps and rps and rps < previous_rps * (1 - max_regression) and 1000 / rps - 1000 / previous_rps >= min_delta_ms:
+            regressions.append({'scenario': name, 'metric': 'throughput_rps', 'baseline': previous_rps, 'current': rps})
+    return regressions
+
+def run(args):
+    from app import create_app
+
+    app = create_app(args.config)
+    # Подсчёт запросов бюджета не должен влиять на замеры; настройки
+    # бюджета читаются в каждом запросе, поэтому действуют и после create_app
+    app.config.update(QUERY_BUDGET_MODE='off', QUERY_DEBUG_HEADERS=False)
+    dataset = prepare_dataset(app, args)
+
+    state = {}
+    results = {}
+    for scenario in scenarios(dataset['counts'], dataset['date_span'], args.batch_size):
+        if args.only and not any(scenario.name.startswith(prefix) for prefix in args.only):
+            continue
+        if scenario.requires and not state.get(scenario.requires):
+            continue
+        results[scenario.name] = measure(app, scenario, state, args)
+        if not args.quiet:
+            result = results[scenario.name]
+            print(f'{scenario.name:<36} {result["throughput_rps"] or 0:>9} rps  '
+                  f'p50={result["latency_ms"]["p50"]}ms p95={result["latency_ms"]["p95"]}ms '
+                  f'p99={result["latency_ms"]["p99"]}ms {result["statuses"]}', file=sys.stderr)
+    cleanup(app, state)
+
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'python': platform.python_version(),
+            'database': app.config['SQLALCHEMY_DATABASE_URI'].split('://', 1)[0],
+            'config': args.config,
+            'analytics_engine': app.config.get('ANALYTICS_ENGINE'),
+            'cache_backend': app.config.get('CACHE_BACKEND'),
+            'requests': args.requests,
+            'threads': args.threads,
+            'seed': args.seed
+        },
+        'dataset': dataset,
+        'results': results
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк эндпоинтов API на сгенерированных данных')
+    parser.add_argument('--sales', type=int, default=100000, help='Количество продаж (1e3 - 1e7)')
+    parser.add_argument('--products', type=int, default=1000, help='Количество продуктов')
+    parser.add_argument('--categories', type=int, default=20, help='Количество категорий')
+    parser.add_argument('--days', type=int, default=365, help='Период продаж в днях')
+    parser.add_argument('--seed', type=int, default=42, help='Зерно генератора данных')
+    parser.add_argument('--database', help='URL базы (по умолчанию - файл SQLite во временном каталоге)')
+    parser.add_argument('--reseed', action='store_true', help='Пересоздать данные, даже если база уже заполнена')
+    parser.add_argument('--requests', type=int, default=200, help='Запросов на каждый сценарий')
+    parser.add_argument('--warmup', type=int, default=10, help='Непрогонных запросов перед измерением чтения')
+    parser.add_argument('--threads', type=int, default=1, help='Параллельных клиентов')
+    parser.add_argument('--batch-size', type=int, default=100, help='Строк в пакетных запросах')
+    parser.add_argument('--only', action='append', help='Префикс имени сценария (можно повторять)')
+    parser.add_argument('--config', default=os.getenv('FLASK_CONFIG') or 'production')
+    parser.add_argument('--output', help='Файл для результата JSON (по умолчанию - stdout)')
+    parser.add_argument('--baseline', help='Результат предыдущего прогона для сравнения')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='Допустимое ухудшение p95 и пропускной способности (0.2 = 20%%)')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help='Меньшее ухудшение в миллисекундах не считается регрессией')
+    parser.add_argument('--quiet', action='store_true', help='Не печатать ход прогона')
+    args = parser.parse_args()
+
+    # Конфигурация читает DATABASE_URL при импорте приложения
+    os.environ['DATABASE_URL'] = args.database or 'sqlite:///' + os.path.join(
+        tempfile.gettempdir(), f'shop-api-bench-{args.sales}-{args.products}-{args.categories}-{args.days}-{args.seed}.sqlite3'
+    )
+
+    result = run(args)
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            result['regressions'] = compare(result['results'], json.load(f), args.max_regression, args.min_delta_ms)
+        exit_code = 1 if result['regressions'] else 0
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    if args.baseline:
+        for regression in result['regressions']:
+            print(f'REGRESSION {regression["scenario"]} {regression["metric"]}: '
+                  f'{regression["baseline"]} -> {regression["current"]}', file=sys.stderr)
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Бенчмарк кодировщиков JSON для jsonify на ответах из 10 000 строк.
+
+Для каждого кодировщика (stdlib, orjson) приложение собирается через
+create_app с JSON_PROVIDER, и jsonify кодирует типичные ответы списков:
+продажи (Sale.to_dict с datetime), продукты и строки с Decimal.
+Печатается JSON с медианным и лучшим временем, размером ответа и
+ускорением относительно stdlib; результаты кодировщиков сверяются.
+База данных не нужна.
+
+Запуск:
+    python benchmarks/json_encoding.py --rows 10000 --repeat 20
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+from decimal import Decimal
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from flask import jsonify
+from app import create_app
+from app.utils.json_provider import orjson, init_json_provider
+
+
+def payloads(rows, seed):
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 1)
+    pagination = {'limit': rows, 'next_cursor': 'WzEwMDAwXQ==', 'has_more': True}
+    return {
+        'sales': {'success': True, 'data': [
+            {
+                'sale_id': i,
+                'product_id': rng.randint(1, 5000),
+                'quantity': rng.randint(1, 5),
+                'date': start + timedelta(seconds=rng.randrange(365 * 86400)),
+                'discount': rng.choice((0.0, 5.0, 10.0))
+            }
+            for i in range(1, rows + 1)
+        ], 'pagination': pagination},
+        'products': {'success': True, 'data': [
+            {
+                'product_id': i,
+                'sku': f'SKU-{i:08d}',
+                'name': f'Product {i}',
+                'description': 'Описание продукта ' * rng.randint(1, 5),
+                'price': round(rng.uniform(1, 500), 2),
+                'stock': rng.randint(0, 500),
+                'category_id': rng.randint(1, 50)
+            }
+            for i in range(1, rows + 1)
+        ], 'pagination': pagination},
+        'decimal_rows': {'success': True, 'data': [
+            {'product_id': i, 'price': Decimal(f'{rng.uniform(1, 500):.2f}'), 'total': Decimal(rng.randint(1, 10 ** 6))}
+            for i in range(1, rows + 1)
+        ]}
+    }
+
+def measure(app, payload, repeat):
+    with app.test_request_context():
+        body = jsonify(payload).get_data()
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            jsonify(payload).get_data()
+            timings.append(time.perf_counter() - started)
+    return body, {
+        'median_ms': round(statistics.median(timings) * 1000, 2),
+        'best_ms': round(min(timings) * 1000, 2),
+        'bytes': len(body)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк кодировщиков JSON для jsonify')
+    parser.add_argument('--rows', type=int, default=10000, help='Строк в ответе')
+    parser.add_argument('--repeat', type=int, default=20, help='Повторов на ответ')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    providers = ['stdlib'] + (['orjson'] if orjson is not None else [])
+    data = payloads(args.rows, args.seed)
+    results = {}
+    bodies = {}
+    for provider in providers:
+        app = create_app('production')
+        app.config['JSON_PROVIDER'] = provider
+        init_json_provider(app)
+        for name, payload in data.items():
+            bodies[provider, name], results.setdefault(name, {})[provider] = measure(app, payload, args.repeat)
+
+    for name, by_provider in results.items():
+        if 'orjson' in by_provider:
+            by_provider['speedup'] = round(by_provider['stdlib']['median_ms'] / by_provider['orjson']['median_ms'], 2)
+            # Тексты могут отличаться экранированием не-ASCII, но не содержимым
+            by_provider['same_content'] = json.loads(bodies['stdlib', name]) == json.loads(bodies['orjson', name])
+
+    print(json.dumps({'rows': args.rows, 'repeat': args.repeat, 'providers': providers, 'results': results}, indent=2))
+    return 0 if all(r.get('same_content', True) for r in results.values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
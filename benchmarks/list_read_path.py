@@ -0,0 +1,102 @@
+"""
+Сравнение путей чтения списков на 10 000 строк: ORM (Model.query + to_dict)
+и Core (select колонок + rows_to_dicts), которым читают GET /api/categories,
+/api/products и /api/sales.
+
+Данные генерируются во временной базе SQLite (или в --database).
+Для каждого пути измеряются процессорное время (медиана по --repeat
+повторам, каждый - в новой сессии) и пик выделенной памяти (tracemalloc),
+а результаты jsonify обоих путей сверяются побайтно.
+
+Запуск:
+    python benchmarks/list_read_path.py --rows 10000 --repeat 10
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def orm_path(model, key, rows):
+    return [item.to_dict() for item in model.query.order_by(key).limit(rows).all()]
+
+def core_path(model, key, rows):
+    from sqlalchemy import select
+    from app import db
+    from app.utils.rows import rows_to_dicts
+
+    columns = model.list_columns()
+    return rows_to_dicts(db.session.execute(select(*columns).order_by(key).limit(rows)).all(), columns)
+
+def measure(path, model, key, rows, repeat):
+    from app import db
+
+    timings = []
+    for _ in range(repeat):
+        db.session.remove()
+        started = time.process_time()
+        path(model, key, rows)
+        timings.append(time.process_time() - started)
+
+    db.session.remove()
+    tracemalloc.start()
+    data = path(model, key, rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.session.remove()
+    return data, {
+        'cpu_ms': round(statistics.median(timings) * 1000, 2),
+        'peak_memory_kb': round(peak / 1024, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнение ORM и Core путей чтения списков')
+    parser.add_argument('--rows', type=int, default=10000, help='Строк в выборке')
+    parser.add_argument('--repeat', type=int, default=10, help='Повторов на путь')
+    parser.add_argument('--database', help='URL пустой базы (по умолчанию - временный файл SQLite)')
+    args = parser.parse_args()
+
+    database = args.database or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'list-read-path.sqlite3')
+    os.environ['DATABASE_URL'] = database
+
+    from flask import jsonify
+    from app import create_app, db
+    from app.models.models import Category, Product, Sale
+    from app.utils.data_generator import seed_database
+
+    app = create_app('production')
+    results = {}
+    with app.test_request_context():
+        db.create_all()
+        if db.session.query(Category.category_id).first() is None:
+            seed_database(args.rows, args.rows, args.rows, 365, seed=1, end=datetime(2024, 1, 1))
+
+        for name, model, key in (('categories', Category, Category.category_id),
+                                 ('products', Product, Product.product_id),
+                                 ('sales', Sale, Sale.sale_id)):
+            orm_data, orm = measure(orm_path, model, key, args.rows, args.repeat)
+            core_data, core = measure(core_path, model, key, args.rows, args.repeat)
+            results[name] = {
+                'rows': len(core_data),
+                'orm': orm,
+                'core': core,
+                'cpu_speedup': round(orm['cpu_ms'] / core['cpu_ms'], 2) if core['cpu_ms'] else None,
+                'memory_ratio': round(orm['peak_memory_kb'] / core['peak_memory_kb'], 2) if core['peak_memory_kb'] else None,
+                'identical_json': jsonify(orm_data).get_data() == jsonify(core_data).get_data()
+            }
+
+    if not args.database:
+        os.remove(database[len('sqlite:///'):])
+    print(json.dumps({'rows': args.rows, 'repeat': args.repeat, 'results': results}, indent=2))
+    return 0 if all(result['identical_json'] for result in results.values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
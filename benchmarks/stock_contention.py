@@ -0,0 +1,116 @@
+"""
+Нагрузочный тест списания остатков: потоки одновременно продают один
+«горячий» продукт через POST /api/sales.
+
+Показывает пропускную способность и проверяет инварианты: остаток
+не уходит в минус, и со склада списано ровно столько, сколько продано.
+Тестовые категория, продукт и продажи удаляются после прогона.
+
+Запуск:
+    DATABASE_URL=postgresql://... python benchmarks/stock_contention.py --threads 32 --requests 5000 --stock 1000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import threading
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func
+from app import create_app, db
+from app.models.models import Category, Product, Sale
+from app.utils.cache import invalidate_date_range
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def run(app, args):
+    with app.app_context():
+        db.create_all()
+        category = Category(name='stock-contention-benchmark', description='Временные данные нагрузочного теста')
+        product = Product(name='hot-sku', price=1, stock=args.stock, category=category)
+        db.session.add(category)
+        db.session.commit()
+        category_id, product_id = category.category_id, product.product_id
+
+    counter = itertools.count()
+    lock = threading.Lock()
+    statuses = Counter()
+    latencies = []
+
+    def worker():
+        client = app.test_client()
+        while next(counter) < args.requests:
+            started = time.perf_counter()
+            response = client.post('/api/sales', json={'product_id': product_id, 'quantity': args.quantity})
+            elapsed = time.perf_counter() - started
+            with lock:
+                statuses[response.status_code] += 1
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        final_stock = db.session.query(Product.stock).filter(Product.product_id == product_id).scalar()
+        sold = db.session.query(func.coalesce(func.sum(Sale.quantity), 0)).filter(Sale.product_id == product_id).scalar()
+        if not args.keep:
+            span = Sale.date_span(Sale.product_id == product_id)
+            db.session.delete(Category.query.get(category_id))
+            db.session.commit()
+            if span[0] is not None:
+                invalidate_date_range(*span)
+
+    expected_sold = min(args.requests, args.stock // args.quantity) * args.quantity
+    return {
+        'threads': args.threads,
+        'requests': args.requests,
+        'quantity': args.quantity,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(args.requests / elapsed, 1),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'latency_ms': {
+            name: round(percentile(latencies, fraction) * 1000, 2)
+            for name, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+        },
+        'initial_stock': args.stock,
+        'final_stock': final_stock,
+        'sold': sold,
+        'checks': {
+            'stock_not_negative': final_stock >= 0,
+            'stock_matches_sales': args.stock - final_stock == sold,
+            'sold_out_exactly': sold == expected_sold
+        }
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест списания остатков одного продукта')
+    parser.add_argument('--threads', type=int, default=16, help='Количество параллельных клиентов')
+    parser.add_argument('--requests', type=int, default=2000, help='Общее количество запросов на продажу')
+    parser.add_argument('--stock', type=int, default=1000, help='Начальный остаток продукта')
+    parser.add_argument('--quantity', type=int, default=1, help='Количество в одной продаже')
+    parser.add_argument('--config', default=os.getenv('FLASK_CONFIG') or 'production')
+    parser.add_argument('--keep', action='store_true', help='Не удалять тестовые данные')
+    args = parser.parse_args()
+
+    result = run(create_app(args.config), args)
+    print(json.dumps(result, indent=2))
+    # Нарушение инвариантов - ненулевой код возврата
+    return 0 if all(result['checks'].values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
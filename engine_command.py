@@ -0,0 +1,22 @@
+import json
+import click
+from flask.cli import with_appcontext
+from app.utils.columnar import ColumnarSalesEngine, check_consistency
+
+@click.command('check-analytics-engine')
+@click.option('--start', type=click.DateTime(), required=True, help='Начало периода')
+@click.option('--end', type=click.DateTime(), required=True, help='Конец периода')
+@click.option('--limit', type=int, default=10, help='Размер топа продуктов для сравнения')
+@with_appcontext
+def check_engine_command(start, end, limit):
+    """Сравнить результаты движка NumPy с SQL-аналитикой за период."""
+    engine = ColumnarSalesEngine()
+    engine.load()
+    click.echo(f"Загружено продаж: {engine.stats()['rows']}")
+    
+    mismatches = check_consistency(engine, start, end, limit)
+    if mismatches:
+        for mismatch in mismatches:
+            click.echo(json.dumps(mismatch, default=str, ensure_ascii=False))
+        raise click.ClickException(f"Найдено расхождений: {len(mismatches)}")
+    click.echo("Результаты совпадают")
@@ -0,0 +1,31 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from app.utils.cache import init_cache
+from app.utils.columnar import init_columnar_engine
+from app.utils.query_plans import check_query_plans
+
+@click.command('explain-queries')
+@click.option('--verbose', is_flag=True, help='Печатать текст запросов и планы целиком')
+@with_appcontext
+def explain_queries_command(verbose):
+    """Проверить планы запросов аналитики и списков на полное чтение таблиц."""
+    # Запросы должны доходить до базы: кэш - отдельный в памяти процесса, аналитика - через SQL
+    current_app.config['CACHE_BACKEND'] = 'memory'
+    current_app.config['ANALYTICS_ENGINE'] = 'sql'
+    init_cache(current_app)
+    init_columnar_engine(current_app)
+    
+    regressions = 0
+    for report in check_query_plans(current_app):
+        status = 'FULL SCAN ' + ', '.join(report['full_scans']) if report['full_scans'] else 'ok'
+        click.echo(f"{report['scenario']}: {status}")
+        if verbose or report['full_scans']:
+            click.echo(f"  {' '.join(report['statement'].split())}")
+            for line in report['plan']:
+                click.echo(f"    {line}")
+        regressions += bool(report['full_scans'])
+    
+    if regressions:
+        raise click.ClickException(f"Запросов с полным чтением таблиц: {regressions}")
+    click.echo("Полных чтений таблиц нет")
@@ -1,5 +1,6 @@
 from app import create_app, db
 from app.models.models import Category, Product, Sale
+from app.utils.rollup import rebuild_rollup
 import random
 from datetime import datetime, timedelta
 import uuid
@@ -113,6 +114,10 @@ def seed_data():
         db.session.commit()
         print(f"Добавлено {len(sales)} продаж")
         
+        # 4. Дневные агрегаты продаж для аналитики
+        rebuild_rollup()
+        db.session.commit()
+        
         print("База данных успешно заполнена!")
 
 if __name__ == "__main__":
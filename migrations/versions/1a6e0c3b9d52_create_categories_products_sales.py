@@ -0,0 +1,53 @@
+"""create categories, products and sales
+
+Revision ID: 1a6e0c3b9d52
+Revises:
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1a6e0c3b9d52'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'categories',
+        sa.Column('category_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('category_id')
+    )
+    op.create_table(
+        'products',
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('price', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('stock', sa.Integer(), nullable=True),
+        sa.Column('category_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['category_id'], ['categories.category_id'], ),
+        sa.PrimaryKeyConstraint('product_id')
+    )
+    op.create_table(
+        'sales',
+        sa.Column('sale_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('date', sa.DateTime(), nullable=False),
+        sa.Column('discount', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['product_id'], ['products.product_id'], ),
+        sa.PrimaryKeyConstraint('sale_id')
+    )
+
+
+def downgrade():
+    op.drop_table('sales')
+    op.drop_table('products')
+    op.drop_table('categories')
@@ -0,0 +1,57 @@
+"""add sales_daily_rollup
+
+Revision ID: 3f9c2a7d1e04
+Revises: 1a6e0c3b9d52
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2a7d1e04'
+down_revision = '1a6e0c3b9d52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    rollup = op.create_table(
+        'sales_daily_rollup',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('discounted_quantity', sa.Float(), nullable=False),
+        sa.Column('discount_sum', sa.Float(), nullable=False),
+        sa.Column('discount_count', sa.Integer(), nullable=False),
+        sa.Column('sale_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['products.product_id'], ),
+        sa.PrimaryKeyConstraint('day', 'product_id')
+    )
+
+    # Заполняем агрегаты по уже существующим продажам
+    sales = sa.table(
+        'sales',
+        sa.column('product_id', sa.Integer),
+        sa.column('quantity', sa.Integer),
+        sa.column('date', sa.DateTime),
+        sa.column('discount', sa.Float)
+    )
+    day = sa.func.date(sales.c.date)
+    op.execute(rollup.insert().from_select(
+        ['day', 'product_id', 'quantity', 'discounted_quantity', 'discount_sum', 'discount_count', 'sale_count'],
+        sa.select(
+            day,
+            sales.c.product_id,
+            sa.func.sum(sales.c.quantity),
+            sa.func.coalesce(sa.func.sum(sales.c.quantity * (1 - sales.c.discount / 100)), 0.0),
+            sa.func.coalesce(sa.func.sum(sales.c.discount), 0.0),
+            sa.func.count(sales.c.discount),
+            sa.func.count()
+        ).group_by(day, sales.c.product_id)
+    ))
+
+
+def downgrade():
+    op.drop_table('sales_daily_rollup')
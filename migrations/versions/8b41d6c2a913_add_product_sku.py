@@ -0,0 +1,26 @@
+"""add products.sku
+
+Revision ID: 8b41d6c2a913
+Revises: 3f9c2a7d1e04
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b41d6c2a913'
+down_revision = '3f9c2a7d1e04'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('products', sa.Column('sku', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_products_sku'), 'products', ['sku'], unique=True)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_products_sku'), table_name='products')
+    op.drop_column('products', 'sku')
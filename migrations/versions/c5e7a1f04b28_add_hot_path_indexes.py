@@ -0,0 +1,41 @@
+"""add indexes for analytics and listing queries
+
+Revision ID: c5e7a1f04b28
+Revises: 8b41d6c2a913
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e7a1f04b28'
+down_revision = '8b41d6c2a913'
+branch_labels = None
+depends_on = None
+
+
+# (имя, таблица, колонки, дополнительные параметры)
+INDEXES = [
+    # Выборки продаж за период; на PostgreSQL покрывающий - аналитика читает только индекс
+    ('ix_sales_date_product_id', 'sales', ['date', 'product_id'], {'postgresql_include': ['quantity', 'discount']}),
+    # Продажи продукта: фильтр product_id, соединения, период продаж продукта
+    ('ix_sales_product_id_date', 'sales', ['product_id', 'date'], {}),
+    # Продукты категории по ключу product_id (GET /products?category_id=...) и products_count
+    ('ix_products_category_id_product_id', 'products', ['category_id', 'product_id'], {}),
+    ('ix_sales_daily_rollup_product_id', 'sales_daily_rollup', ['product_id'], {}),
+]
+
+
+def upgrade():
+    # На PostgreSQL индексы строятся CONCURRENTLY, не блокируя запись в таблицы;
+    # такое построение не выполняется внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, table, columns, kwargs in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, **kwargs)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, *_ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,34 @@
+"""add backfill_checkpoints
+
+Revision ID: e2d94b7a6c31
+Revises: c5e7a1f04b28
+Create Date: 2026-10-18 18:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2d94b7a6c31'
+down_revision = 'c5e7a1f04b28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'backfill_checkpoints',
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('last_key', sa.BigInteger(), nullable=True),
+        sa.Column('rows_updated', sa.BigInteger(), nullable=False),
+        sa.Column('chunks', sa.Integer(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('backfill_checkpoints')
@@ -0,0 +1,129 @@
+import os
+import tempfile
+import click
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models.models import Category, Product, Sale
+from app.utils.rollup import rebuild_rollup
+from app.utils.query_budget import track_queries, budget_for, QUERY_REPEAT_LIMIT
+
+# Объём тестовых данных: списки должны быть длиннее порога повторов, чтобы N+1 был заметен
+CATEGORIES = 30
+PRODUCTS_PER_CATEGORY = 5
+SALES_PER_PRODUCT = 4
+BATCH_SIZE = 50
+
+# Эндпоинты, запросы которых проверяет команда
+CHECKED_BLUEPRINTS = ('categories', 'products', 'sales')
+
+
+def seed():
+    start = datetime(2023, 1, 1)
+    categories = [Category(name=f'Category {i}', description='') for i in range(CATEGORIES)]
+    db.session.add_all(categories)
+    db.session.flush()
+    products = [
+        Product(name=f'Product {c.category_id}-{i}', price=10 + i, stock=1000, category_id=c.category_id)
+        for c in categories for i in range(PRODUCTS_PER_CATEGORY)
+    ]
+    db.session.add_all(products)
+    db.session.flush()
+    db.session.add_all([
+        Sale(product_id=p.product_id, quantity=1 + i, discount=5.0 * i, date=start + timedelta(days=(p.product_id + i) % 28, hours=i))
+        for p in products for i in range(SALES_PER_PRODUCT)
+    ])
+    rebuild_rollup()
+    db.session.commit()
+
+def scenarios():
+    """
+    Запросы ко всем маршрутам категорий, продуктов и продаж: (метод, URL, тело).
+    Идентификаторы соответствуют данным seed() в пустой базе
+    """
+    period = 'start_date=2023-01-03T12:00:00&end_date=2023-01-20'
+    last_product = CATEGORIES * PRODUCTS_PER_CATEGORY
+    return [
+        ('GET', '/api/categories', None),
+        ('GET', '/api/categories/1', None),
+        ('POST', '/api/categories', {'name': 'New category'}),
+        ('PUT', '/api/categories/1', {'description': 'Updated'}),
+        ('GET', '/api/products', None),
+        ('GET', '/api/products?category_id=1', None),
+        ('GET', '/api/products/1', None),
+        ('POST', '/api/products', {'name': 'New product', 'price': 5, 'stock': 10, 'category_id': 1}),
+        ('PUT', '/api/products/1', {'price': 99}),
+        ('POST', '/api/products/bulk', {'products': [
+            {'product_id': product_id, 'price': 20} for product_id in range(1, BATCH_SIZE // 2 + 1)
+        ] + [
+            {'sku': f'SKU-{i}', 'name': f'Bulk {i}', 'price': 1, 'category_id': 1} for i in range(BATCH_SIZE // 2)
+        ]}),
+        ('GET', '/api/sales', None),
+        ('GET', f'/api/sales?product_id=1&{period}', None),
+        ('GET', '/api/sales/1', None),
+        ('GET', '/api/sales/export?format=csv', None),
+        ('POST', '/api/sales', {'product_id': 1, 'quantity': 1, 'date': '2023-01-05T10:00:00'}),
+        ('POST', '/api/sales/batch', {'sales': [
+            {'product_id': 1 + i % 10, 'quantity': 1, 'date': f'2023-01-{1 + i % 28:02d}T09:00:00'} for i in range(BATCH_SIZE)
+        ]}),
+        ('PUT', '/api/sales/1', {'quantity': 2, 'product_id': 3}),
+        ('DELETE', '/api/sales/2', None),
+        ('GET', f'/api/sales/total?{period}', None),
+        ('GET', f'/api/sales/top-products?{period}&limit=10', None),
+        ('GET', f'/api/sales/timeseries?{period}&granularity=day', None),
+        ('GET', '/api/sales/cache/stats', None),
+        ('POST', '/api/sales/cache/clear', None),
+        ('DELETE', f'/api/products/{last_product}', None),
+        ('DELETE', f'/api/categories/{CATEGORIES - 1}', None),
+    ]
+
+
+@click.command('check-query-budgets')
+@click.option('--verbose', is_flag=True, help='Печатать повторяющиеся запросы')
+def check_query_budgets_command(verbose):
+    """Проверить количество запросов к базе во всех маршрутах API на временной базе."""
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app(os.getenv('FLASK_CONFIG') or 'default')
+        app.config.update(
+            SQLALCHEMY_DATABASE_URI='sqlite:///' + os.path.join(directory, 'budget.db'),
+            SQLALCHEMY_ENGINE_OPTIONS={},
+            QUERY_BUDGET_MODE='off',
+            TESTING=True
+        )
+        repeat_limit = app.config.get('QUERY_REPEAT_LIMIT', QUERY_REPEAT_LIMIT)
+        
+        with app.app_context():
+            db.create_all()
+            seed()
+            checked = set()
+            failures = 0
+            client = app.test_client()
+            for method, url, body in scenarios():
+                with track_queries() as tracker:
+                    response = client.open(url, method=method, json=body)
+                    response.get_data()
+                endpoint = app.url_map.bind('').match(url.split('?')[0], method=method)[0]
+                checked.add(endpoint)
+                
+                budget = budget_for(app, endpoint)
+                problems = tracker.violations(budget, repeat_limit)
+                if response.status_code >= 400:
+                    problems.insert(0, f'unexpected status {response.status_code}')
+                failures += bool(problems)
+                click.echo(f"{'FAIL' if problems else 'ok  '} {method:6} {url.split('?')[0]:40} "
+                           f"queries={tracker.count:<3} budget={budget:<3} max_repeat={tracker.max_repeat}")
+                for problem in problems:
+                    click.echo(f"       {problem}")
+                if verbose:
+                    for statement, count in tracker.repeated(1):
+                        click.echo(f"       x{count} {' '.join(statement.split())[:150]}")
+            db.session.remove()
+        
+        missing = sorted(
+            rule.endpoint for rule in app.url_map.iter_rules()
+            if rule.endpoint.split('.')[0] in CHECKED_BLUEPRINTS and rule.endpoint not in checked
+        )
+        for endpoint in missing:
+            click.echo(f"FAIL {endpoint}: нет сценария проверки")
+        if failures or missing:
+            raise click.ClickException(f"Нарушений бюджета: {failures}, маршрутов без проверки: {len(missing)}")
+        click.echo("Все маршруты укладываются в бюджет запросов")
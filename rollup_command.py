@@ -0,0 +1,20 @@
+import click
+from flask.cli import with_appcontext
+from app import db
+from app.utils.rollup import rebuild_rollup
+
+@click.command('rebuild-rollup')
+@click.option('--start', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Первый пересчитываемый день (YYYY-MM-DD)')
+@click.option('--end', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Последний пересчитываемый день (YYYY-MM-DD)')
+@with_appcontext
+def rebuild_rollup_command(start, end):
+    """Пересчитать дневные агрегаты продаж (sales_daily_rollup)."""
+    start_day = start.date() if start else None
+    end_day = end.date() if end else None
+    
+    click.echo("Пересчёт дневных агрегатов продаж...")
+    rows = rebuild_rollup(start_day, end_day)
+    db.session.commit()
+    click.echo(f"Записано {rows} строк агрегатов")
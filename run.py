@@ -1,7 +1,17 @@
 import os
 from app import create_app
+from rollup_command import rebuild_rollup_command
+from engine_command import check_engine_command
+from explain_command import explain_queries_command
+from query_budget_command import check_query_budgets_command
+from seed_command import seed_command
 
 app = create_app(os.getenv('FLASK_CONFIG') or 'default')
+app.cli.add_command(rebuild_rollup_command)
+app.cli.add_command(check_engine_command)
+app.cli.add_command(explain_queries_command)
+app.cli.add_command(check_query_budgets_command)
+app.cli.add_command(seed_command)
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000) 
\ No newline at end of file
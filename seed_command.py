@@ -1,118 +1,58 @@
 import click
+from datetime import datetime
 from flask.cli import with_appcontext
-from app import db
-from app.models.models import Category, Product, Sale
-import random
-from datetime import datetime, timedelta
+from app.models.models import Category
+from app.utils.cache import clear_cache
+from app.utils.data_generator import seed_database, SEED_CHUNK_SIZE, ZIPF_EXPONENT
 
 @click.command('seed-db')
+@click.option('--sales', type=click.IntRange(min=0), default=1000, show_default=True, help='Количество продаж')
+@click.option('--products', type=click.IntRange(min=1), default=30, show_default=True, help='Количество продуктов')
+@click.option('--categories', type=click.IntRange(min=1), default=None,
+              help='Количество категорий (по умолчанию - одна на 50 продуктов, не меньше 5)')
+@click.option('--days', type=click.IntRange(min=1), default=180, show_default=True, help='Период продаж в днях')
+@click.option('--seed', type=int, default=0, show_default=True, help='Зерно генератора: одинаковое зерно - одинаковые данные')
+@click.option('--end-date', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Последний день периода продаж (YYYY-MM-DD, по умолчанию - сегодня)')
+@click.option('--zipf', type=float, default=ZIPF_EXPONENT, show_default=True,
+              help='Показатель распределения популярности продуктов')
+@click.option('--chunk-size', type=click.IntRange(min=1), default=SEED_CHUNK_SIZE, show_default=True,
+              help='Продаж в одной пакетной вставке')
 @with_appcontext
-def seed_command():
-    """Заполнить базу данных начальными данными."""
+def seed_command(sales, products, categories, days, seed, end_date, zipf, chunk_size):
+    """Заполнить базу данных синтетическими данными."""
     # Проверка наличия данных, чтобы избежать дублирования
     if Category.query.count() > 0:
         click.echo("База данных уже содержит данные. Отмена заполнения.")
         return
 
-    click.echo("Начало заполнения базы данных...")
-    
-    # 1. Создание категорий
-    categories = [
-        Category(name="Electronics", description="Электронные устройства и гаджеты"),
-        Category(name="Clothing", description="Одежда разных стилей и сезонов"),
-        Category(name="Books", description="Книги различных жанров и форматов"),
-        Category(name="Home", description="Товары для дома и интерьера"),
-        Category(name="Sports", description="Спортивный инвентарь и аксессуары")
-    ]
-    
-    db.session.add_all(categories)
-    db.session.commit()
-    click.echo(f"Добавлено {len(categories)} категорий")
-    
-    # 2. Создание продуктов
-    products = []
-    
-    # Electronics
-    products.extend([
-        Product(name="Laptop", description="Мощный ноутбук для работы и игр", price=1200.00, stock=15, category_id=1),
-        Product(name="Smartphone", description="Современный смартфон с отличной камерой", price=800.00, stock=25, category_id=1),
-        Product(name="Tablet", description="Планшет для работы и развлечений", price=450.00, stock=20, category_id=1),
-        Product(name="Headphones", description="Беспроводные наушники с шумоподавлением", price=180.00, stock=30, category_id=1),
-        Product(name="Smart Watch", description="Умные часы с трекером активности", price=250.00, stock=18, category_id=1),
-        Product(name="Camera", description="Цифровая камера высокого разрешения", price=700.00, stock=10, category_id=1)
-    ])
-    
-    # Clothing
-    products.extend([
-        Product(name="T-shirt", description="Хлопковая футболка базового стиля", price=25.00, stock=40, category_id=2),
-        Product(name="Jeans", description="Классические джинсы прямого кроя", price=65.00, stock=35, category_id=2),
-        Product(name="Jacket", description="Легкая куртка для прохладной погоды", price=120.00, stock=15, category_id=2),
-        Product(name="Sneakers", description="Удобные кроссовки для повседневной носки", price=80.00, stock=20, category_id=2),
-        Product(name="Sweater", description="Теплый свитер из мягкой шерсти", price=55.00, stock=25, category_id=2),
-        Product(name="Dress", description="Элегантное платье для особых случаев", price=110.00, stock=12, category_id=2)
-    ])
-    
-    # Books
-    products.extend([
-        Product(name="Novel", description="Современный роман известного автора", price=18.00, stock=30, category_id=3),
-        Product(name="Textbook", description="Учебник по программированию", price=45.00, stock=20, category_id=3),
-        Product(name="Cookbook", description="Книга рецептов мировой кухни", price=22.00, stock=25, category_id=3),
-        Product(name="Biography", description="Биография выдающейся личности", price=24.00, stock=15, category_id=3),
-        Product(name="Children's Book", description="Иллюстрированная книга для детей", price=15.00, stock=40, category_id=3),
-        Product(name="Self-Help", description="Книга по саморазвитию", price=19.00, stock=35, category_id=3)
-    ])
-    
-    # Home
-    products.extend([
-        Product(name="Lamp", description="Современная настольная лампа", price=65.00, stock=18, category_id=4),
-        Product(name="Pillow", description="Мягкая подушка для комфортного сна", price=30.00, stock=25, category_id=4),
-        Product(name="Blanket", description="Теплый плед для уютных вечеров", price=45.00, stock=20, category_id=4),
-        Product(name="Vase", description="Декоративная ваза для цветов", price=55.00, stock=15, category_id=4),
-        Product(name="Coffee Table", description="Стильный журнальный столик", price=120.00, stock=10, category_id=4),
-        Product(name="Kitchenware Set", description="Набор кухонных принадлежностей", price=85.00, stock=12, category_id=4)
-    ])
-    
-    # Sports
-    products.extend([
-        Product(name="Yoga Mat", description="Нескользящий коврик для йоги", price=35.00, stock=25, category_id=5),
-        Product(name="Dumbbells", description="Набор гантелей разного веса", price=70.00, stock=18, category_id=5),
-        Product(name="Water Bottle", description="Спортивная бутылка для воды", price=15.00, stock=40, category_id=5),
-        Product(name="Running Shoes", description="Кроссовки для бега с амортизацией", price=95.00, stock=20, category_id=5),
-        Product(name="Fitness Tracker", description="Браслет для отслеживания активности", price=60.00, stock=25, category_id=5),
-        Product(name="Tennis Racket", description="Теннисная ракетка для начинающих", price=50.00, stock=15, category_id=5)
-    ])
-    
-    db.session.add_all(products)
-    db.session.commit()
-    click.echo(f"Добавлено {len(products)} продуктов")
-    
-    # 3. Создание продаж за последние 6 месяцев
-    sales = []
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=180)  # 6 месяцев
-    
-    all_products = Product.query.all()
-    for product in all_products:
-        # От 5 до 15 продаж для каждого продукта
-        num_sales = random.randint(5, 15)
-        for _ in range(num_sales):
-            # Случайная дата в пределах 6 месяцев
-            sale_date = start_date + timedelta(
-                days=random.randint(0, 180),
-                hours=random.randint(0, 23),
-                minutes=random.randint(0, 59)
-            )
-            # Случайное количество от 1 до 5
-            quantity = random.randint(1, 5)
-            
-            sales.append(Sale(
-                product_id=product.product_id,
-                quantity=quantity,
-                date=sale_date
-            ))
-    
-    db.session.add_all(sales)
-    db.session.commit()
-    click.echo(f"Добавлено {len(sales)} продаж")
-    
-    click.echo("База данных успешно заполнена!") 
\ No newline at end of file
+    if categories is None:
+        categories = min(products, max(5, products // 50))
+    click.echo(f"Начало заполнения базы данных: {categories} категорий, {products} продуктов, "
+               f"{sales} продаж за {days} дней (seed={seed})...")
+
+    step = max(sales // 20, chunk_size)
+    reported = [0]
+    started = datetime.now()
+
+    def progress(inserted, total):
+        # Ход вставки продаж примерно каждые 5%
+        if inserted - reported[0] >= step or inserted == total:
+            reported[0] = inserted
+            elapsed = (datetime.now() - started).total_seconds()
+            click.echo(f"  продажи: {inserted}/{total} ({inserted / elapsed:,.0f} строк/с)")
+
+    stats = seed_database(
+        sales, products, categories, days, seed=seed, end=end_date,
+        chunk_size=chunk_size, exponent=zipf, progress=progress
+    )
+    # Закэшированная аналитика относится к прежнему содержимому базы
+    clear_cache()
+
+    for table, table_stats in stats.items():
+        rate = f"{table_stats['rows_per_second']:,.0f} строк/с" if table_stats['rows_per_second'] else '-'
+        click.echo(f"{table}: {table_stats['rows']} строк за {table_stats['seconds']:.2f} с ({rate})")
+    total_seconds = sum(table_stats['seconds'] for table_stats in stats.values())
+    total_rows = sum(table_stats['rows'] for table_stats in stats.values())
+    click.echo(f"База данных успешно заполнена: {total_rows} строк за {total_seconds:.2f} с "
+               f"({total_rows / total_seconds:,.0f} строк/с)")
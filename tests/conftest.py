@@ -0,0 +1,56 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from app import create_app, db
+from app.utils.cache import clear_cache
+from app.utils.query_budget import track_queries
+from query_budget_command import seed
+
+
+@pytest.fixture
+def app(tmp_path):
+    """
+    Приложение на временной базе SQLite с данными seed() команды
+    check-query-budgets; бюджет запросов проверяется в режиме raise
+    """
+    app = create_app('default')
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI='sqlite:///' + str(tmp_path / 'test.db'),
+        SQLALCHEMY_ENGINE_OPTIONS={},
+        CACHE_BACKEND='memory',
+        ANALYTICS_ENGINE='sql',
+        QUERY_BUDGET_MODE='raise',
+        TESTING=True
+    )
+    with app.app_context():
+        db.create_all()
+        seed()
+        clear_cache()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def count_queries(client):
+    """
+    Выполняет HTTP-запрос и считает его запросы к базе:
+
+        response, tracker = count_queries('GET', '/api/products')
+        tracker.count, tracker.max_repeat
+    """
+    def request(method, url, json=None):
+        with track_queries() as tracker:
+            response = client.open(url, method=method, json=json)
+            response.get_data()
+        return response, tracker
+    return request
@@ -0,0 +1,42 @@
+from app import db
+from app.models.models import Product
+from app.routes import product_routes
+
+
+def test_bulk_creates_and_updates_products(client):
+    response = client.post('/api/products/bulk', json={'products': [
+        {'sku': 'NEW-1', 'name': 'New', 'price': 1, 'category_id': 1},
+        {'product_id': 1, 'price': 50},
+        {'product_id': 2},
+    ]})
+
+    data = response.get_json()['data']
+    assert response.status_code == 200
+    assert (data['created'], data['updated'], data['unchanged']) == (1, 1, 1)
+    assert Product.query.get(data['results'][0]['product_id']).sku == 'NEW-1'
+
+
+def test_bulk_reports_concurrently_created_sku_as_updated(client, monkeypatch):
+    load = product_routes._load_bulk_products
+
+    def load_then_insert(product_ids, skus):
+        rows = load(product_ids, skus)
+        # Продукт с тем же артикулом создаёт другой запрос после проверки
+        with db.engine.begin() as connection:
+            connection.execute(Product.__table__.insert(), {
+                'sku': 'RACE-1', 'name': 'Concurrent', 'price': 1, 'stock': 0, 'category_id': 1
+            })
+        return rows
+
+    monkeypatch.setattr(product_routes, '_load_bulk_products', load_then_insert)
+    response = client.post('/api/products/bulk', json={'products': [
+        {'sku': 'RACE-1', 'name': 'Synced', 'price': 2, 'category_id': 1},
+        {'sku': 'NEW-2', 'name': 'New', 'price': 3, 'category_id': 1},
+    ]})
+
+    data = response.get_json()['data']
+    assert response.status_code == 200
+    assert (data['created'], data['updated']) == (1, 1)
+    assert [result['status'] for result in data['results']] == ['updated', 'created']
+    product = Product.query.filter_by(sku='RACE-1').one()
+    assert (data['results'][0]['product_id'], product.name) == (product.product_id, 'Synced')
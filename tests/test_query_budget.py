@@ -0,0 +1,76 @@
+import pytest
+from app.utils.query_budget import budget_for, assert_max_queries, QueryBudgetExceeded, QUERY_REPEAT_LIMIT
+from app.models.models import Category
+
+PERIOD = 'start_date=2023-01-03T12:00:00&end_date=2023-01-20'
+
+# Горячие эндпоинты: (метод, URL, тело, эндпоинт)
+HOT_ENDPOINTS = [
+    ('GET', '/api/categories', None, 'categories.get_categories'),
+    ('GET', '/api/categories/1', None, 'categories.get_category'),
+    ('GET', '/api/products', None, 'products.get_products'),
+    ('GET', '/api/products?category_id=1', None, 'products.get_products'),
+    ('GET', '/api/products/1', None, 'products.get_product'),
+    ('GET', '/api/sales', None, 'sales.get_sales'),
+    ('GET', f'/api/sales?product_id=1&{PERIOD}', None, 'sales.get_sales'),
+    ('GET', '/api/sales/1', None, 'sales.get_sale'),
+    ('GET', f'/api/sales/total?{PERIOD}', None, 'sales.get_total_sales'),
+    ('GET', f'/api/sales/top-products?{PERIOD}&limit=10', None, 'sales.get_top_products'),
+    ('GET', f'/api/sales/timeseries?{PERIOD}&granularity=day', None, 'sales.get_sales_timeseries'),
+    ('POST', '/api/sales', {'product_id': 1, 'quantity': 1, 'date': '2023-01-05T10:00:00'}, 'sales.create_sale'),
+    ('POST', '/api/sales/batch', {'sales': [
+        {'product_id': 1 + i % 10, 'quantity': 1, 'date': f'2023-01-{1 + i % 28:02d}T09:00:00'} for i in range(50)
+    ]}, 'sales.create_sales_batch'),
+]
+
+
+@pytest.mark.parametrize('method, url, body, endpoint', HOT_ENDPOINTS, ids=[f'{m} {u}' for m, u, _, _ in HOT_ENDPOINTS])
+def test_hot_endpoint_within_budget(app, count_queries, method, url, body, endpoint):
+    response, tracker = count_queries(method, url, body)
+
+    assert response.status_code < 400
+    assert tracker.count <= budget_for(app, endpoint)
+    assert not tracker.repeated(QUERY_REPEAT_LIMIT)
+
+
+def test_list_queries_do_not_grow_with_rows(count_queries):
+    _, page = count_queries('GET', '/api/products?limit=5')
+    _, full = count_queries('GET', '/api/products?limit=100')
+
+    assert page.count == full.count
+
+
+def test_counters_reset_between_requests_in_one_app_context(app, client):
+    # Запросы тестового клиента выполняются в общем контексте приложения
+    app.config['QUERY_DEBUG_HEADERS'] = True
+    first = client.get('/api/categories')
+    second = client.get('/api/categories')
+    created = client.post('/api/categories', json={'name': 'New'})
+
+    assert first.headers['X-DB-Queries'] == second.headers['X-DB-Queries']
+    assert created.status_code == 201
+    assert int(created.headers['X-DB-Queries']) <= budget_for(app, 'categories.create_category')
+
+
+def test_budget_violation_raises(app, client):
+    app.config['QUERY_BUDGETS'] = dict(app.config['QUERY_BUDGETS'], **{'products.get_products': 0})
+
+    with pytest.raises(QueryBudgetExceeded):
+        client.get('/api/products')
+
+
+def test_mode_changed_after_create_app_is_applied(app, client):
+    app.config['QUERY_BUDGETS'] = dict(app.config['QUERY_BUDGETS'], **{'products.get_products': 0})
+    app.config['QUERY_BUDGET_MODE'] = 'off'
+
+    response = client.get('/api/products')
+
+    assert response.status_code == 200
+    assert 'X-DB-Queries' not in response.headers
+
+
+def test_assert_max_queries_detects_repeats(app):
+    with pytest.raises(QueryBudgetExceeded, match='N\\+1'):
+        with assert_max_queries(100, repeat_limit=2):
+            for category_id in range(1, 5):
+                Category.query.get(category_id)
@@ -0,0 +1,15 @@
+from app.utils.query_plans import check_query_plans, full_scans
+
+
+def test_hot_queries_use_indexes(app):
+    reports = check_query_plans(app)
+
+    assert reports
+    assert [(report['scenario'], report['full_scans']) for report in reports if report['full_scans']] == []
+
+
+def test_full_scans_parses_postgresql_and_sqlite_plans():
+    assert full_scans(['Seq Scan on sales  (cost=0.00..1.00 rows=1 width=4)']) == {'sales'}
+    assert full_scans(['SCAN sales']) == {'sales'}
+    assert full_scans(['SEARCH sales USING INDEX ix_sales_date_product_id (date>? AND date<?)']) == set()
+    assert full_scans(['SCAN products USING COVERING INDEX ix_products_category_id_product_id']) == set()
@@ -0,0 +1,20 @@
+from app.models.models import Sale
+
+PERIOD = 'start_date=2023-02-01&end_date=2023-02-28T23:59:59'
+
+
+def test_batch_with_mixed_timezones_is_stored_in_utc_and_invalidates_cache(client):
+    before = client.get(f'/api/sales/total?{PERIOD}').get_json()['data']['total_sales']
+
+    response = client.post('/api/sales/batch', json={'sales': [
+        {'product_id': 1, 'quantity': 1, 'date': '2023-02-10T09:00:00'},
+        {'product_id': 1, 'quantity': 1, 'date': '2023-02-11T03:00:00+05:00'},
+    ]})
+
+    assert response.status_code == 201
+    sale_ids = [result['data']['sale_id'] for result in response.get_json()['data']['results']]
+    dates = sorted(Sale.query.get(sale_id).date for sale_id in sale_ids)
+    assert [date.isoformat() for date in dates] == ['2023-02-10T09:00:00', '2023-02-10T22:00:00']
+
+    after = client.get(f'/api/sales/total?{PERIOD}').get_json()['data']['total_sales']
+    assert after > before
@@ -0,0 +1,46 @@
+import time
+import threading
+from sqlalchemy.engine import Engine
+from app.utils import db_pool
+
+
+def test_deep_status_reports_database(client):
+    response = client.get('/status?deep=1')
+
+    assert response.status_code == 200
+    assert response.get_json()['database']['ok'] is True
+
+
+def test_slow_ping_does_not_block_other_callers(app, monkeypatch):
+    db_pool._last_ping = None
+    assert db_pool.ping_database(ttl=0)['ok'] is True
+
+    started = threading.Event()
+    release = threading.Event()
+    connect = Engine.connect
+
+    def slow_connect(self, *args, **kwargs):
+        # База «не отвечает», пока тест не отпустит проверку
+        started.set()
+        release.wait(5)
+        return connect(self, *args, **kwargs)
+
+    monkeypatch.setattr(Engine, 'connect', slow_connect)
+    results = []
+
+    def ping():
+        with app.app_context():
+            results.append(db_pool.ping_database(ttl=0))
+
+    pinger = threading.Thread(target=ping)
+    pinger.start()
+    assert started.wait(5)
+
+    began = time.perf_counter()
+    cached = db_pool.ping_database(ttl=0)
+    assert time.perf_counter() - began < 0.5
+    assert cached['ok'] is True
+
+    release.set()
+    pinger.join(5)
+    assert results and results[0]['ok'] is True